@@ -1,233 +1,99 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import io
 import traceback
-import time
-
-# --- בדיקת ספריית ג'מיני ---
-try:
-    import google.generativeai as genai
-    HAS_GENAI = True
-except ImportError:
-    HAS_GENAI = False
-
-# ================= 1. UTILS =================
-
-def safe_str(val):
-    if val is None or pd.isna(val): return None
-    try:
-        if isinstance(val, (dict, list, tuple, set)): return str(val)
-        s = str(val).strip()
-        if s.lower() in ['nan', 'none', '', 'null']: return None
-        return s
-    except: return ""
+import logging
+
+from engine import (safe_str, clean_semester, load_table, parquet_bytes, parse_availability,
+                    preprocess_courses, preprocess_availability, build_avail_masks,
+                    Scheduler, SchedulingInstance, run_solver, prepare_courses,
+                    courses_usecols, availability_usecols, new_seed)
+from chat_client import ChatClient
+from chat_context import build_chat_context, make_lookup_tools
+from cache import DEFAULT_CACHE, cached_load, cached_availability, result_key
+from scoring import score_schedule
+from metrics import NULL_METRICS, Metrics
+from rooms import RoomInventory, preprocess_rooms
+from views import ScheduleViews
+
+# --- בדיקת ספריית ג'מיני (טעינה עצלה - רק כשמשתמשים בממשק/צ'אט) ---
+_genai = None
+log = logging.getLogger(__name__)
+
+def get_genai():
+    """Imports google.generativeai on first use; returns None when the library is missing."""
+    global _genai
+    if _genai is None:
+        try:
+            import google.generativeai as genai
+            _genai = genai
+        except ImportError:
+            _genai = False
+    return _genai or None
 
-def clean_semester(val):
-    s = str(val).strip().replace("'", "").replace('"', "")
-    if s in ['א', 'A', 'a', '1']: return 1
-    if s in ['ב', 'B', 'b', '2']: return 2
-    if s in ['ג', 'C', 'c', '3']: return 3
-    try: return int(float(s))
-    except: return 1
+# ================= 1. UI HELPERS =================
 
 def load_uploaded_file(uploaded_file):
     if uploaded_file is None: return None
-    try:
-        filename = getattr(uploaded_file, 'name', 'unknown.xlsx')
-        if filename.endswith('.csv'):
-            try: return pd.read_csv(uploaded_file, encoding='utf-8')
-            except: return pd.read_csv(uploaded_file, encoding='cp1255')
-        else: return pd.read_excel(uploaded_file)
+    try: return load_table(uploaded_file)
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
 
-def parse_availability(row, cols):
-    for col in cols:
-        val = row[col]
-        if pd.isna(val): continue
-        s_col = str(col).strip()
-        if len(s_col) < 2 or not s_col[:2].isdigit(): continue
-        try:
-            day = int(s_col[0])
-            semester = int(s_col[1])
-            if not (1 <= day <= 7): continue
-            parts = str(val).replace(';', ',').split(',')
-            for p in parts:
-                p = p.strip()
-                if '-' in p:
-                    p_split = p.split('-')
-                    start = int(float(p_split[0]))
-                    end = int(float(p_split[1]))
-                    for h in range(start, end):
-                        yield (semester, day, h)
-        except: continue
-
-# ================= 2. PRE-PROCESSING =================
-
-def preprocess_courses(df):
-    df = df.dropna(how='all')
-    df.columns = df.columns.str.strip()
-    col_map = {}
-    for col in df.columns:
-        c = str(col).strip()
-        if c == 'מרצה': col_map[col] = 'Lecturer'
-        elif c == 'שם קורס': col_map[col] = 'Course'
-        elif c == 'שעות': col_map[col] = 'Duration'
-        elif c == 'סמסטר': col_map[col] = 'Semester'
-        elif c == 'קישור': col_map[col] = 'LinkID'
-        elif c == 'אילוץ יום': col_map[col] = 'FixDay'
-        elif c == 'אילוץ שעה': col_map[col] = 'FixHour'
-        elif c == 'מרחב': col_map[col] = 'Space'
-        elif c == 'שנה': col_map[col] = 'Year'
-    df = df.rename(columns=col_map)
-    if 'Course' not in df.columns or 'Lecturer' not in df.columns: return pd.DataFrame()
-    df = df[df['Course'].notna() & df['Lecturer'].notna()]
-    for col in ['Course', 'Lecturer', 'Space', 'LinkID', 'Year']:
-        if col not in df.columns: df[col] = None
-        df[col] = df[col].apply(safe_str)
-    if 'Semester' in df.columns: df['Semester'] = df['Semester'].apply(clean_semester)
-    else: df['Semester'] = 1
-    if 'Duration' in df.columns: df['Duration'] = pd.to_numeric(df['Duration'], errors='coerce').fillna(2).astype(int)
-    else: df['Duration'] = 2
-    for col in ['FixDay', 'FixHour']:
-        if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
-        else: df[col] = None
-    return df
-
-def preprocess_availability(df):
-    df = df.dropna(how='all')
-    df.columns = df.columns.str.strip()
-    lecturer_col = None
-    for col in df.columns:
-        if str(col).strip() == "שם מלא": lecturer_col = col; break
-    if not lecturer_col:
-        for col in df.columns:
-            if "שם" in str(col) or "מרצה" in str(col): lecturer_col = col; break
-    if not lecturer_col: st.error("No 'Full Name' column found in availability file."); return None, None
-    df = df.rename(columns={lecturer_col: 'Lecturer'})
-    df['Lecturer'] = df['Lecturer'].apply(safe_str)
-    df = df[df['Lecturer'].notna()]
-    avail_db = {}
-    sparsity = {}
-    avail_cols = [c for c in df.columns if str(c).isdigit()]
-    for _, row in df.iterrows():
-        lec = row['Lecturer']
-        if not lec: continue
-        lec = " ".join(lec.split())
-        if lec not in avail_db: avail_db[lec] = {}
-        count = 0
-        for sem, day, h in parse_availability(row, avail_cols):
-            if sem not in avail_db[lec]: avail_db[lec][sem] = {}
-            if day not in avail_db[lec][sem]: avail_db[lec][sem][day] = set()
-            avail_db[lec][sem][day].add(h)
-            count += 1
-        sparsity[lec] = count
-    return avail_db, sparsity
-
-# ================= 3. SCHEDULER ENGINE =================
-
-class Scheduler:
-    def __init__(self, courses, avail_db, sparsity):
-        self.courses = courses
-        self.avail_db = avail_db
-        self.sparsity = sparsity
-        self.schedule = []
-        self.errors = []
-        self.busy = {} 
-        self.processed_links = set()
-        
-    def is_student_busy(self, year, sem, day, h):
-        return self.busy.get(year, {}).get(sem, {}).get(day, {}).get(h, False)
-    
-    def set_student_busy(self, year, sem, day, h):
-        if not year: return
-        if year not in self.busy: self.busy[year] = {}
-        if sem not in self.busy[year]: self.busy[year][sem] = {}
-        if day not in self.busy[year][sem]: self.busy[year][sem][day] = {}
-        self.busy[year][sem][day][h] = True
-
-    def run(self, shuffle=False):
-        self.courses['Lecturer'] = self.courses['Lecturer'].apply(lambda x: " ".join(str(x).split()))
-        df = self.courses.copy()
-        df['Sparsity'] = df['Lecturer'].map(self.sparsity).fillna(0).astype(int)
-        wave_hard = df[df['LinkID'].notna() | df['FixDay'].notna() | df['FixHour'].notna()]
-        wave_soft = df[~df.index.isin(wave_hard.index)]
-        if shuffle: wave_soft = wave_soft.sample(frac=1).reset_index(drop=True)
-        else: wave_soft = wave_soft.sort_values(by=['Sparsity', 'Duration'], ascending=[True, False])
-        waves = [wave_hard, wave_soft]
-        self.schedule = []
-        self.errors = []
-        self.busy = {}
-        self.processed_links = set()
-        for wave in waves:
-            for _, row in wave.iterrows():
-                try:
-                    lid = row['LinkID']
-                    if lid and lid in self.processed_links: continue
-                    group = [row]
-                    if lid:
-                        group_df = self.courses[self.courses['LinkID'] == lid]
-                        group = group_df.to_dict('records')
-                        self.processed_links.add(lid)
-                    self.attempt_schedule(row, group)
-                except: continue
-        return pd.DataFrame(self.schedule), pd.DataFrame(self.errors)
-
-    def attempt_schedule(self, main_row, group):
-        try:
-            dur = int(main_row['Duration'])
-            sem = int(main_row['Semester'])
-        except: self.fail(group, "Invalid Data"); return
-        days = [int(main_row['FixDay'])] if pd.notna(main_row['FixDay']) else [1,2,3,4,5]
-        hours = list(range(8, 22))
-        if str(main_row.get('Space')).lower() == 'zoom': hours.reverse()
-        if pd.notna(main_row['FixHour']): hours = [int(main_row['FixHour'])]
-        for day in days:
-            for start_h in hours:
-                if start_h + dur > 22: continue
-                if self.check_valid(group, sem, day, start_h, dur):
-                    self.commit(group, sem, day, start_h, dur); return
-        reason = "No Time Slot Found"
-        if pd.notna(main_row['FixDay']): reason += " [Day Constraint]"
-        self.fail(group, reason)
-
-    def check_valid(self, group, sem, day, start_h, dur):
-        for item in group:
-            lec = item['Lecturer']
-            year = item.get('Year')
-            for h in range(start_h, start_h + dur):
-                if lec not in self.avail_db: return False
-                if sem not in self.avail_db[lec]: return False
-                if day not in self.avail_db[lec][sem]: return False
-                if h not in self.avail_db[lec][sem][day]: return False
-                for s in self.schedule:
-                    if s['Lecturer'] == lec and s['Day'] == day and s['Hour'] == h and s['Semester'] == sem: return False
-                if year and self.is_student_busy(year, sem, day, h): return False
-        return True
-
-    def commit(self, group, sem, day, start_h, dur):
-        for item in group:
-            for h in range(start_h, start_h + dur):
-                self.schedule.append({
-                    'Year': item.get('Year'), 'Semester': sem, 'Day': day, 'Hour': h,
-                    'Course': item.get('Course'), 'Lecturer': item.get('Lecturer'),
-                    'Space': item.get('Space'), 'LinkID': item.get('LinkID')
-                })
-                if item.get('Year'): self.set_student_busy(item['Year'], sem, day, h)
-
-    def fail(self, group, reason):
-        for item in group:
-            self.errors.append({'Course': item.get('Course'), 'Lecturer': item.get('Lecturer'), 'Reason': reason, 'LinkID': item.get('LinkID')})
+def show_diagnostics(metrics):
+    """Diagnostics panel: stage timings, counters, per-restart stats and swallowed errors."""
+    d = metrics.to_dict()
+    with st.expander("🩺 Diagnostics"):
+        if d['stages']:
+            st.bar_chart(pd.Series(d['stages'], name="seconds"))
+        st.write(d['counters'])
+        if d['restarts']:
+            st.dataframe(pd.DataFrame(d['restarts']))
+        if d['events']:
+            st.warning(f"{d['counters'].get('availability_parse_error', 0)} availability cells / "
+                       f"{d['counters'].get('scheduler_error', 0)} course rows could not be processed:")
+            st.dataframe(pd.DataFrame(d['events']))
+        st.download_button("📊 Download Metrics (JSON)", metrics.to_json(indent=2).encode('utf-8'), "metrics.json")
+
+def show_views(views):
+    """Results tabs: filtered table, lecturer timetables, year grids, free slots and heatmaps."""
+    any_of = lambda x: "All" if x is None else str(x)
+    t_all, t_lec, t_year, t_free, t_heat = st.tabs(["📋 All", "👩‍🏫 Lecturers", "🎓 Years", "🟩 Free slots", "🔥 Heatmaps"])
+    with t_all:
+        c1, c2, c3, c4 = st.columns(4)
+        lec = c1.selectbox("Lecturer", [None] + views.lecturers, format_func=any_of, key="view_all_lec")
+        year = c2.selectbox("Year", [None] + views.years, format_func=any_of, key="view_all_year")
+        sem = c3.selectbox("Semester", [None] + views.semesters, format_func=any_of, key="view_all_sem")
+        day = c4.selectbox("Day", [None] + views.days, format_func=any_of, key="view_all_day")
+        st.dataframe(views.filter(lecturer=lec, year=year, semester=sem, day=day))
+    # הגריד של כל לשונית הוא לסמסטר אחד
+    sem = st.sidebar.selectbox("Semester (grids)", views.semesters, key="view_sem")
+    with t_lec:
+        lec = st.selectbox("Lecturer", views.lecturers, key="view_lec")
+        st.dataframe(views.lecturer_timetable(lec, sem))
+    with t_year:
+        year = st.selectbox("Year", views.years, key="view_year")
+        st.dataframe(views.year_grid(year, sem))
+    with t_free:
+        lec = st.selectbox("Lecturer", views.lecturers, key="view_free_lec")
+        st.dataframe(views.free_slots(lec, sem).replace({True: "✓", False: ""}))
+    with t_heat:
+        st.caption("Courses taught in parallel")
+        st.dataframe(views.load_heatmap(sem))
+        c1, c2 = st.columns(2)
+        c1.caption("Lecturers booked twice")
+        c1.dataframe(views.conflict_heatmap(sem, by='Lecturer'))
+        c2.caption("Student years booked twice")
+        c2.dataframe(views.conflict_heatmap(sem, by='Year'))
 
 # ================= 4. CHAT FUNCTIONS (Fixed List) =================
 
-def init_chat_session(schedule_df, errors_df, api_key):
-    """Initializes chat by iterating through a SAFE list of models."""
-    if not HAS_GENAI or not api_key: return None
+def init_chat_session(schedule_df, errors_df, api_key, client=None):
+    """Initializes chat on the first SAFE model that answers (cached per API key)."""
+    genai = get_genai() if client is None else client.genai
+    if not genai or not api_key: return None
     
-    genai.configure(api_key=api_key)
+    client = client or ChatClient(genai)
+    client.configure(api_key)
     generation_config = genai.types.GenerationConfig(temperature=0.0)
     
     # 1. הגדרות בטיחות (חשוב!)
@@ -238,17 +104,15 @@ def init_chat_session(schedule_df, errors_df, api_key):
         {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
     ]
 
-    # 2. הכנת נתונים
-    csv_sched = schedule_df.to_csv(index=False)
-    csv_errors = errors_df.to_csv(index=False)
+    # 2. הכנת נתונים - תקציר דחוס + כלי שליפה מקומיים במקום כל ה-CSV
+    context = build_chat_context(schedule_df, errors_df)
+    tools = client.use_tools(make_lookup_tools(schedule_df, errors_df))
     
     prompt = f"""
     You are a data analyst for a university scheduling system.
     Data:
-    SUCCESSFUL SCHEDULE:
-    {csv_sched}
-    FAILED COURSES:
-    {csv_errors}
+    {context}
+    For details not listed above, call lookup_schedule / lookup_failures.
     Answer ONLY based on this data. Use Hebrew.
     """
 
@@ -259,25 +123,19 @@ def init_chat_session(schedule_df, errors_df, api_key):
         "gemini-pro"        # ישן ויציב
     ]
 
-    # 4. לולאת ניסוי וטעייה
-    active_model = None
+    # 4. בחירת מודל - נבדק פעם אחת לכל מפתח ונשמר במטמון
+    active_model = client.pick_model(api_key, safe_models)
     chat_session = None
 
-    for model_name in safe_models:
+    if active_model:
         try:
-            # מנסים ליצור מודל ולהתחיל שיחה
-            model = genai.GenerativeModel(model_name, generation_config=generation_config, safety_settings=safety_settings)
-            chat = model.start_chat(history=[{"role": "user", "parts": prompt}, {"role": "model", "parts": "אני כאן."}])
-            
-            # אם הגענו לפה - זה עבד!
-            active_model = model_name
-            chat_session = chat
-            break 
-            
+            model = genai.GenerativeModel(active_model, generation_config=generation_config, safety_settings=safety_settings,
+                                          tools=tools)
+            # הכלים מופעלים ב-ChatClient.stream_reply - קריאה אוטומטית של ה-SDK לא מאפשרת הזרמה
+            chat_session = model.start_chat(history=[{"role": "user", "parts": prompt}, {"role": "model", "parts": "אני כאן."}])
         except Exception as e:
-            # מתעלמים וממשיכים למודל הבא
-            print(f"DEBUG: Failed to init {model_name}: {e}")
-            continue
+            log.warning("Failed to start a chat on %s: %s", active_model, e)
+            client.forget_model(api_key)
 
     if not chat_session:
         return None
@@ -289,8 +147,11 @@ def init_chat_session(schedule_df, errors_df, api_key):
 
 # ================= 5. MAIN =================
 
-def main_process(courses_file, avail_file, iterations=30):
+def main_process(courses_file, avail_file, iterations=30, seed=None, workers=1, solver='greedy', time_limit=10.0,
+                 previous=None, previous_errors=None, weights=None, improve_time=0.0, diagnostics=False,
+                 rooms_file=None):
     if not courses_file or not avail_file: return
+    metrics = Metrics() if diagnostics else NULL_METRICS
     
     # --- קבלת API KEY ---
     api_key = None
@@ -299,7 +160,7 @@ def main_process(courses_file, avail_file, iterations=30):
     
     with st.sidebar:
         st.header("🤖 Chat Settings")
-        if not HAS_GENAI:
+        if not get_genai():
             st.warning("Chat library missing.")
         elif api_key:
             st.success("✅ API Key loaded")
@@ -310,56 +171,94 @@ def main_process(courses_file, avail_file, iterations=30):
     st.info("🔄 Loading Data...")
     
     try:
-        c_raw = load_uploaded_file(courses_file)
-        a_raw = load_uploaded_file(avail_file)
+        # מטמון לפי תוכן הקבצים - ריצה חוזרת של Streamlit לא מפרסרת ולא משבצת מחדש
+        try:
+            with metrics.stage('load_files'):
+                c_raw, c_key = cached_load(courses_file, usecols=courses_usecols)
+                a_raw, a_key = cached_load(avail_file, usecols=availability_usecols)
+        except Exception as e:
+            st.error(f"Error loading file: {e}"); return
         if c_raw is None or a_raw is None: return
         
-        avail_db, sparsity = preprocess_availability(a_raw)
+        try:
+            with metrics.stage('preprocess_availability'): avail_db, sparsity = cached_availability(a_raw, a_key)
+        except ValueError as e:
+            st.error(str(e)); return
         if not avail_db: return
         
-        courses = preprocess_courses(c_raw)
+        with metrics.stage('preprocess_courses'): courses = preprocess_courses(c_raw)
         if courses.empty:
             st.error("Courses file invalid.")
             return
 
-        courses['Lecturer'] = courses['Lecturer'].apply(lambda x: " ".join(str(x).split()))
-        valid_lecs = set(avail_db.keys())
-        mask = courses['Lecturer'].isin(valid_lecs)
-        
-        if not mask.all():
-            missing = courses[~mask]['Lecturer'].unique()
+        with metrics.stage('prepare_courses'): final_courses, missing = prepare_courses(courses, avail_db)
+        if missing:
             st.warning(f"⚠️ {len(missing)} lecturers missing availability (e.g. {missing[:3]})")
             
-        final_courses = courses[mask].copy()
         if final_courses.empty:
             st.error("No courses to schedule (0 matches).")
             return
 
-        st.success(f"✅ Scheduling ({iterations} iterations)...")
-        best_sched = pd.DataFrame(); best_errors = pd.DataFrame(); min_errors = float('inf')
+        # בדיקת היתכנות מוקדמת - קורסים שאין להם אף משבצת אפשרית, לפני החיפוש
+        rooms, r_key = None, None
+        if rooms_file:
+            try:
+                r_raw, r_key = cached_load(rooms_file)
+                rooms = RoomInventory(preprocess_rooms(r_raw))
+            except ValueError as e:
+                st.error(str(e)); return
+
+        def feasibility():
+            masks = build_avail_masks(avail_db)
+            return masks, SchedulingInstance(final_courses, sparsity, masks, rooms).feasibility.report()
+        # נשמר במטמון לפי תוכן הקבצים - ריצה חוזרת (למשל הודעת צ'אט) לא בונה את המופע מחדש
+        with metrics.stage('feasibility'):
+            avail_masks, infeasible = DEFAULT_CACHE.get_or_compute(('feasibility', c_key, a_key, r_key), feasibility)
+        if not infeasible.empty:
+            with st.expander(f"🚫 {len(infeasible)} courses cannot be placed in any slot"):
+                st.dataframe(infeasible)
+
+        st.success(f"✅ Scheduling ({iterations} iterations)..." if solver == 'greedy' else f"✅ Scheduling ({solver}, up to {time_limit}s)...")
         bar = st.progress(0)
-        
-        for i in range(iterations + 1):
-            bar.progress(i/(iterations+1))
-            sched = Scheduler(final_courses, avail_db, sparsity)
-            s, e = sched.run(shuffle=(i > 0))
-            
-            if len(e) < min_errors:
-                min_errors = len(e); best_sched = s; best_errors = e
-                if min_errors == 0: break
+        # זרע בסיס אחד לסשן - ריצות חוזרות של Streamlit נשארות באותו מפתח מטמון, והריצה ניתנת לשחזור
+        if seed is None: seed = st.session_state.setdefault('random_seed', new_seed())
+        params = dict(solver=solver, iterations=iterations, seed=seed, workers=workers, time_limit=time_limit,
+                      previous=previous, previous_errors=previous_errors, weights=weights, improve_time=improve_time)
+        hits = DEFAULT_CACHE.hits
+        res_key = result_key(c_key, a_key, rooms=r_key, **params)
+        with metrics.stage('schedule'):
+            best_sched, best_errors = DEFAULT_CACHE.get_or_compute(
+                res_key,
+                lambda: run_solver(final_courses, avail_db, sparsity, on_progress=bar.progress, metrics=metrics,
+                                   rooms=rooms, **params))
+        metrics.count('result_cache_hits', DEFAULT_CACHE.hits - hits)
         
         bar.empty()
         
         # === שלב 1: הצגת התוצאות וההורדה ===
         st.divider()
-        c1, c2 = st.columns(2)
+        c1, c2, c3 = st.columns(3)
         unique_sched = len(best_sched.drop_duplicates(subset=['Course', 'Lecturer'])) if not best_sched.empty else 0
         c1.metric("✅ Scheduled", unique_sched)
         c2.metric("❌ Failed", len(best_errors), delta_color="inverse")
+        score = score_schedule(best_sched, weights)
+        c3.metric("📐 Quality score", score['score'], help="Lower is better")
+        if solver == 'greedy': st.caption(f"🎲 Seed: {seed} (use it to reproduce this run)")
+        with st.expander("Quality breakdown"):
+            st.write({"Student-year gap hours": score['year_gaps'], "Lecturer days on campus": score['lecturer_days'],
+                      "Late hours (not Zoom)": score['late_hours'], "Daily load (sum of squares)": score['load_balance']})
         
         if not best_sched.empty:
-            st.dataframe(best_sched)
+            # תצוגות מאונדקסות - נבנות פעם אחת לכל תוצאה ונשמרות במטמון בין ריצות חוזרות
+            with metrics.stage('views'):
+                views = DEFAULT_CACHE.get_or_compute(('views', res_key),
+                                                     lambda: ScheduleViews(best_sched, best_errors, avail_masks))
+            show_views(views)
             st.download_button("📥 Download Schedule", best_sched.to_csv(index=False).encode('utf-8-sig'), "schedule.csv")
+            if (pq := parquet_bytes(best_sched)) is not None:
+                st.download_button("📦 Download Schedule (Parquet)", pq, "schedule.parquet")
+            try: st.download_button("📗 Download Schedule (Excel, sheet per year)", views.to_excel(), "schedule.xlsx")
+            except ImportError: pass
             
         if not best_errors.empty:
             st.error("Errors:")
@@ -371,14 +270,17 @@ def main_process(courses_file, avail_file, iterations=30):
         st.subheader("💬 Result Analysis (AI)")
 
         try:
-            if not HAS_GENAI:
+            if not get_genai():
                 st.info("הצ'אט אינו זמין (חסרה ספרייה).")
             elif not api_key:
                 st.info("הצ'אט אינו זמין (חסר מפתח API).")
             else:
-                # אתחול צ'אט
+                # אתחול צ'אט - לקוח אחד לסשן, גם לאתחול וגם לתשובות
+                if "chat_client" not in st.session_state: st.session_state.chat_client = ChatClient(get_genai())
+                client = st.session_state.chat_client
                 if "gemini_chat" not in st.session_state:
-                    st.session_state.gemini_chat = init_chat_session(best_sched, best_errors, api_key)
+                    with metrics.stage('chat_init'):
+                        st.session_state.gemini_chat = init_chat_session(best_sched, best_errors, api_key, client)
                     st.session_state.chat_history = []
                 
                 # בדיקה אם האתחול הצליח
@@ -388,7 +290,8 @@ def main_process(courses_file, avail_file, iterations=30):
                     # רענון מפתח
                     if "last_key" not in st.session_state or st.session_state.last_key != api_key:
                         st.session_state.last_key = api_key
-                        st.session_state.gemini_chat = init_chat_session(best_sched, best_errors, api_key)
+                        with metrics.stage('chat_init'):
+                            st.session_state.gemini_chat = init_chat_session(best_sched, best_errors, api_key, client)
                         st.session_state.chat_history = []
 
                     for msg in st.session_state.chat_history:
@@ -399,15 +302,20 @@ def main_process(courses_file, avail_file, iterations=30):
                         st.chat_message("user").write(prompt)
                         
                         try:
-                            resp = st.session_state.gemini_chat.send_message(prompt)
-                            st.session_state.chat_history.append({"role": "assistant", "content": resp.text})
-                            st.chat_message("assistant").write(resp.text)
+                            with st.chat_message("assistant"):
+                                placeholder = st.empty()
+                                text = client.stream_reply(
+                                    st.session_state.gemini_chat, prompt, on_text=lambda t: placeholder.markdown(t + "▌"))
+                                placeholder.markdown(text)
+                            st.session_state.chat_history.append({"role": "assistant", "content": text})
                         except Exception as e:
                              st.error(f"⚠️ שגיאה בקבלת תשובה: {str(e)}")
 
         except Exception as e:
             st.warning(f"⚠️ שגיאה כללית בצ'אט: {e}")
 
+        if metrics.enabled: show_diagnostics(metrics)
+
     except Exception:
         st.error("System Error:")
         st.code(traceback.format_exc())
@@ -0,0 +1,175 @@
+"""Multi-department batch scheduling against one shared AVAILABILITY file.
+
+    python batch.py AVAILABILITY COURSES [COURSES ...] [-o OUT_DIR] [--workers N]
+
+Departments that share a lecturer are coupled and solved jointly, so one global
+lecturer occupancy is respected; departments with disjoint lecturers are independent
+and solved in parallel. Inside a joint run every department keeps its own student
+years and LinkIDs (they are namespaced by department), and the result is split back
+into per-department schedules plus a cross-department lecturer conflict report.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from engine import (availability_usecols, courses_usecols, load_table, new_seed, prepare_courses,
+                    preprocess_availability, preprocess_courses, run_solver, save_table)
+from metrics import NULL_METRICS
+from rooms import RoomInventory, preprocess_rooms
+
+SEP = '\x1f'   # מפריד בין שם המחלקה לערך (לא מופיע בקבצי קלט)
+CONFLICT_COLS = ['Lecturer', 'Semester', 'Day', 'Hour', 'Departments', 'Courses']
+
+
+def coupled_components(lecturers):
+    """Groups departments that share lecturers. lecturers: {dept: set of names} -> [[dept, ...], ...]."""
+    parent = {d: d for d in lecturers}
+
+    def find(d):
+        while parent[d] != d:
+            parent[d] = parent[parent[d]]
+            d = parent[d]
+        return d
+    owner = {}
+    for dept, names in lecturers.items():
+        for name in names:
+            if name in owner: parent[find(dept)] = find(owner[name])
+            else: owner[name] = dept
+    groups = {}
+    for dept in lecturers: groups.setdefault(find(dept), []).append(dept)
+    return list(groups.values())
+
+
+def _tag(dept, courses):
+    out = courses.copy()
+    out['Course'] = dept + SEP + out['Course'].astype(str)
+    for col in ['Year', 'LinkID']:
+        out[col] = [dept + SEP + v if v else v for v in out[col]]
+    return out
+
+
+def _untag(df):
+    """Splits a joint result back into {dept: frame}, removing the department namespace."""
+    if df is None or df.empty: return {}
+    df = df.copy()
+    dept = df['Course'].str.split(SEP, n=1).str[0]
+    for col in ['Course', 'Year', 'LinkID']:
+        if col in df.columns:
+            df[col] = [v.split(SEP, 1)[1] if isinstance(v, str) and SEP in v else v for v in df[col]]
+    return {d: part.reset_index(drop=True) for d, part in df.groupby(dept, sort=False)}
+
+
+def _solve_component(courses, avail_db, sparsity, params):
+    return run_solver(courses, avail_db, sparsity, **params)
+
+
+def department_conflicts(schedules):
+    """Hours in which one lecturer is booked by more than one department. schedules: {dept: hourly schedule}."""
+    frames = [s.assign(Department=d) for d, s in schedules.items() if s is not None and not s.empty]
+    if not frames: return pd.DataFrame(columns=CONFLICT_COLS)
+    df = pd.concat(frames, ignore_index=True)
+    keys = ['Lecturer', 'Semester', 'Day', 'Hour']
+    grouped = df.groupby(keys).agg(Departments=('Department', lambda x: sorted(set(x))),
+                                   Courses=('Course', lambda x: sorted(set(x)))).reset_index()
+    return grouped[grouped['Departments'].str.len() > 1].reset_index(drop=True)[CONFLICT_COLS]
+
+
+def schedule_departments(departments, avail_raw, solver='greedy', iterations=30, seed=None, workers=1,
+                         time_limit=10.0, weights=None, improve_time=0.0, metrics=NULL_METRICS, rooms_raw=None):
+    """Schedules several COURSES frames ({dept: raw frame}) against one raw AVAILABILITY frame.
+
+    Returns (schedules, errors, conflicts, info): per-department hourly schedules and
+    errors, the cross-department conflict report, and info with the coupled
+    components, the lecturers missing availability per department and the base seed
+    (drawn when seed=None). With a shared
+    ROOMS frame (rooms_raw) all departments compete for the same rooms and are solved
+    as one component.
+    """
+    with metrics.stage('preprocess_availability'): avail_db, sparsity = preprocess_availability(avail_raw, metrics)
+    if not avail_db: raise ValueError("Availability file has no lecturers.")
+    prepared, missing = {}, {}
+    with metrics.stage('preprocess_courses'):
+        for dept, raw in departments.items():
+            courses = preprocess_courses(raw)
+            if courses.empty: raise ValueError(f"Courses file invalid: {dept}")
+            prepared[dept], missing[dept] = prepare_courses(courses, avail_db)
+    components = coupled_components({d: set(c['Lecturer']) for d, c in prepared.items()})
+    rooms = RoomInventory(preprocess_rooms(rooms_raw)) if rooms_raw is not None else None
+    if rooms is not None: components = [list(prepared)]
+    if seed is None: seed = new_seed()
+    params = dict(solver=solver, iterations=iterations, seed=seed, time_limit=time_limit, weights=weights,
+                  improve_time=improve_time, rooms=rooms)
+    jobs = []
+    for comp in components:
+        frames = [_tag(d, prepared[d]) for d in comp if not prepared[d].empty]
+        if frames: jobs.append(pd.concat(frames, ignore_index=True))
+
+    with metrics.stage('schedule'):
+        if workers <= 1 or len(jobs) <= 1:
+            # רכיב יחיד - המקביליות עוברת לריצות החוזרות שבתוכו
+            inner = dict(params, workers=workers, metrics=metrics)
+            results = [_solve_component(c, avail_db, sparsity, inner) for c in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                results = list(pool.map(_solve_component, jobs, [avail_db] * len(jobs), [sparsity] * len(jobs),
+                                        [dict(params, workers=1)] * len(jobs)))
+
+    schedules = {d: pd.DataFrame() for d in departments}
+    errors = {d: pd.DataFrame() for d in departments}
+    for sched, errs in results:
+        schedules.update(_untag(sched))
+        errors.update(_untag(errs))
+    conflicts = department_conflicts(schedules)
+    metrics.count('department_conflict_hours', len(conflicts))
+    info = {'components': components, 'missing_lecturers': missing, 'seed': seed}
+    return schedules, errors, conflicts, info
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Schedule several departments against one shared AVAILABILITY file.")
+    p.add_argument("availability", help="Shared AVAILABILITY file (.xlsx / .csv / .parquet)")
+    p.add_argument("courses", nargs='+', help="One COURSES file per department; the file name is the department")
+    p.add_argument("-o", "--out-dir", default=".", help="Directory for per-department schedule/errors and conflicts")
+    p.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    p.add_argument("--solver", choices=["greedy", "csp"], default="greedy")
+    p.add_argument("--iterations", type=int, default=30)
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--workers", type=int, default=1, help="Parallel processes for independent departments")
+    p.add_argument("--time-limit", type=float, default=10.0)
+    p.add_argument("--rooms", default=None, help="Shared ROOMS file (חדר / קיבולת / סוג)")
+    args = p.parse_args(argv)
+
+    try:
+        departments = {os.path.splitext(os.path.basename(f))[0]: load_table(f, courses_usecols) for f in args.courses}
+        if len(departments) != len(args.courses):
+            raise ValueError("Department file names must be unique.")
+        schedules, errors, conflicts, info = schedule_departments(
+            departments, load_table(args.availability, availability_usecols), solver=args.solver,
+            iterations=args.iterations, seed=args.seed, workers=args.workers, time_limit=args.time_limit,
+            rooms_raw=load_table(args.rooms) if args.rooms else None)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for dept in departments:
+        save_table(schedules[dept], os.path.join(args.out_dir, f"schedule_{dept}.{args.format}"))
+        save_table(errors[dept], os.path.join(args.out_dir, f"errors_{dept}.{args.format}"))
+        n_sched = len(schedules[dept].drop_duplicates(subset=['Course', 'Lecturer'])) if not schedules[dept].empty else 0
+        print(f"{dept}: Scheduled: {n_sched}  Failed: {len(errors[dept])}")
+        missing = info['missing_lecturers'][dept]
+        if missing:
+            print(f"Warning: {dept}: {len(missing)} lecturers missing availability, their courses were skipped "
+                  f"(e.g. {missing[:3]})", file=sys.stderr)
+    save_table(conflicts, os.path.join(args.out_dir, f"conflicts.{args.format}"))
+    print(f"Coupled groups: {[c for c in info['components'] if len(c) > 1]}")
+    print(f"Cross-department conflict hours: {len(conflicts)}")
+    print(f"Seed: {info['seed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Scheduler benchmarks on synthetic COURSES/AVAILABILITY instances.
+
+    python benchmark.py                         # default scaling sweep
+    python benchmark.py --lecturers 200 --courses 1500 --solvers greedy csp --json out.json
+
+For every instance size and solver configuration it reports wall time, peak Python
+memory (from a separate tracemalloc run; worker processes are not included), placements per second and
+the number of failed courses, plus the preprocessing time of both input files.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+
+from engine import build_avail_masks, prepare_courses, preprocess_availability, preprocess_courses, run_solver
+
+YEARS = ['א', 'ב', 'ג', 'ד', 'ה', 'ו']
+SEMESTERS = ['א', 'ב']
+
+
+def generate_instance(lecturers=30, courses=150, years=4, link_density=0.1, availability=0.6,
+                      fix_density=0.05, seed=0):
+    """Synthetic (courses_df, availability_df) in the raw Hebrew upload format.
+
+    link_density: share of courses that belong to a LinkID group (groups of 2-3).
+    availability: share of (day, semester) cells in which a lecturer lists hours.
+    fix_density: share of courses with a FixDay (a fifth of those also get a FixHour).
+    """
+    r = random.Random(seed)
+    names = [f"מרצה {i}" for i in range(lecturers)]
+    rows = []
+    n_linked = int(courses * link_density)
+    i = 0
+    while i < courses:
+        size = r.choice([2, 3]) if i < n_linked else 1
+        lid = f"L{i}" if size > 1 else None
+        sem, dur, year = r.choice(SEMESTERS), r.choice([1, 2, 2, 3, 4]), r.choice(YEARS[:years])
+        for _ in range(min(size, courses - i)):
+            fix_day = r.randint(1, 5) if r.random() < fix_density else None
+            rows.append({
+                'מרצה': r.choice(names), 'שם קורס': f"קורס {i}", 'שעות': dur, 'סמסטר': sem,
+                'קישור': lid, 'אילוץ יום': fix_day,
+                'אילוץ שעה': r.randint(8, 16) if fix_day and r.random() < 0.2 else None,
+                'מרחב': r.choice(['zoom', 'כיתה', None]), 'שנה': year if size == 1 else r.choice(YEARS[:years]),
+            })
+            i += 1
+    avail_rows = []
+    for name in names:
+        row = {'שם מלא': name}
+        for day in range(1, 6):
+            for sem in (1, 2):
+                if r.random() < availability:
+                    start = r.randint(8, 14)
+                    end = r.randint(start + 2, 21)
+                    row[f"{day}{sem}"] = f"{start}-{end}" + (f", {end}-{min(end + 1, 22)}" if r.random() < 0.2 else "")
+        avail_rows.append(row)
+    return pd.DataFrame(rows), pd.DataFrame(avail_rows)
+
+
+def _measure(fn, memory=False):
+    """(result, wall seconds, peak traced bytes or None). The timed run is untraced, since
+    tracemalloc slows allocation-heavy code several times over; with memory=True fn runs
+    a second time under tracemalloc for the peak."""
+    t0 = time.perf_counter()
+    result = fn()
+    wall = time.perf_counter() - t0
+    if not memory: return result, wall, None
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+    return result, wall, peak
+
+
+def run_benchmark(instance, solvers, iterations=30, seed=0, time_limit=10.0, workers=1, memory=True):
+    """Runs every solver configuration on one generated instance; returns a list of result dicts.
+
+    peak_mb comes from a separate traced run (memory=False skips it and reports None).
+    """
+    courses_raw, avail_raw = generate_instance(seed=seed, **instance)
+    (avail_db, sparsity), t_avail, _ = _measure(lambda: preprocess_availability(avail_raw.copy()))
+    courses, t_courses, _ = _measure(lambda: preprocess_courses(courses_raw.copy()))
+    courses, _ = prepare_courses(courses, avail_db)
+    _, t_masks, _ = _measure(lambda: build_avail_masks(avail_db))
+    out = []
+    for solver in solvers:
+        (sched, errors), wall, peak = _measure(lambda: run_solver(
+            courses, avail_db, sparsity, solver, iterations, seed=seed, workers=workers, time_limit=time_limit), memory)
+        placed = len(sched.drop_duplicates(subset=['Course', 'Lecturer'])) if not sched.empty else 0
+        out.append({
+            **instance, 'solver': solver, 'wall_s': round(wall, 4), 'peak_mb': round(peak / 2 ** 20, 2) if peak is not None else None,
+            'placements': placed, 'placements_per_s': round(placed / wall, 1) if wall else None,
+            'failed': len(errors), 'preprocess_availability_s': round(t_avail, 4),
+            'preprocess_courses_s': round(t_courses, 4), 'build_avail_masks_s': round(t_masks, 4),
+        })
+    return out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    p.add_argument("--lecturers", type=int, nargs='*', default=[20, 50, 100, 200])
+    p.add_argument("--courses", type=int, nargs='*', default=None,
+                   help="Courses per instance (default: 5 per lecturer)")
+    p.add_argument("--years", type=int, default=4)
+    p.add_argument("--link-density", type=float, default=0.1)
+    p.add_argument("--availability", type=float, default=0.6)
+    p.add_argument("--solvers", nargs='*', default=['greedy', 'csp'], choices=['greedy', 'csp'])
+    p.add_argument("--iterations", type=int, default=30)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--time-limit", type=float, default=10.0)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--no-memory", action="store_true", help="Skip the second, traced run that measures peak memory")
+    p.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = p.parse_args(argv)
+
+    courses = args.courses or [n * 5 for n in args.lecturers]
+    results = []
+    for n_lec, n_courses in zip(args.lecturers, courses):
+        instance = dict(lecturers=n_lec, courses=n_courses, years=args.years,
+                        link_density=args.link_density, availability=args.availability)
+        results += run_benchmark(instance, args.solvers, args.iterations, args.seed, args.time_limit, args.workers,
+                                 not args.no_memory)
+
+    cols = ['lecturers', 'courses', 'solver', 'wall_s', 'peak_mb', 'placements', 'placements_per_s', 'failed',
+            'preprocess_availability_s']
+    print(pd.DataFrame(results)[cols].to_string(index=False))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f: json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
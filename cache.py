@@ -0,0 +1,139 @@
+"""Content-hash cache for parsed inputs and scheduling results.
+
+Streamlit re-executes app.py on every widget interaction, but imported modules stay
+loaded, so DEFAULT_CACHE lives for the whole server process. Keys are SHA-256 hashes
+of the uploaded bytes (plus the scheduler parameters for results), so a rerun or a
+repeat upload of the same files is answered without re-parsing or re-solving.
+"""
+import hashlib
+import io
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from engine import availability_usecols, courses_usecols, load_table, preprocess_availability, solve
+
+
+def content_key(*parts):
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else repr(p).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def read_bytes(src):
+    """Raw bytes of a path, a Streamlit UploadedFile or any file-like object."""
+    if isinstance(src, (str, os.PathLike)):
+        with open(src, 'rb') as f: return f.read()
+    if hasattr(src, 'getvalue'): return src.getvalue()
+    data = src.read()
+    if hasattr(src, 'seek'): src.seek(0)
+    return data
+
+
+class ResultCache:
+    """Thread-safe LRU of at most max_entries values, optionally backed by pickles in disk_dir."""
+
+    def __init__(self, max_entries=32, disk_dir=None, max_disk_entries=256):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir: os.makedirs(disk_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, content_key(key) + '.pkl')
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+        if self.disk_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), 'rb') as f: value = pickle.load(f)
+            except Exception: return default
+            os.utime(self._path(key))
+            self._remember(key, value)
+            self.hits += 1
+            return value
+        return default
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            tmp = self._path(key) + '.tmp'
+            with open(tmp, 'wb') as f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+            self._trim_disk()
+
+    def get_or_compute(self, key, fn):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            self.misses += 1
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock: self._items.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'): os.remove(os.path.join(self.disk_dir, name))
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries: self._items.popitem(last=False)
+
+    def _trim_disk(self):
+        files = [os.path.join(self.disk_dir, n) for n in os.listdir(self.disk_dir) if n.endswith('.pkl')]
+        if len(files) <= self.max_disk_entries: return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            try: os.remove(path)
+            except OSError: pass
+
+
+DEFAULT_CACHE = ResultCache(disk_dir=os.environ.get('RUPIN_CACHE_DIR') or None)
+
+
+def cached_load(src, cache=None, usecols=None):
+    """load_table memoized on the file's content (and column filter). Returns (DataFrame, content key)."""
+    cache = cache or DEFAULT_CACHE
+    data = read_bytes(src)
+    name = str(getattr(src, 'name', src))
+    key = content_key(data, os.path.splitext(name)[1].lower())
+
+    def load():
+        buf = io.BytesIO(data)
+        buf.name = name
+        return load_table(buf, usecols)
+    return cache.get_or_compute(('table', key, getattr(usecols, '__name__', None)), load), key
+
+
+def cached_availability(avail_raw, avail_key, cache=None):
+    """preprocess_availability memoized on the availability file's content key."""
+    return (cache or DEFAULT_CACHE).get_or_compute(('avail', avail_key), lambda: preprocess_availability(avail_raw))
+
+
+def result_key(courses_key, avail_key, **params):
+    params = {k: v.to_csv(index=False).encode('utf-8') if hasattr(v, 'to_csv') else v
+              for k, v in params.items() if k not in ('on_progress', 'metrics')}
+    return ('result', courses_key, avail_key, content_key(sorted(params.items())))
+
+
+def cached_solve(courses_src, avail_src, cache=None, **params):
+    """engine.solve memoized on both files' content and the scheduler parameters."""
+    cache = cache or DEFAULT_CACHE
+    c_raw, c_key = cached_load(courses_src, cache, courses_usecols)
+    a_raw, a_key = cached_load(avail_src, cache, availability_usecols)
+    return cache.get_or_compute(result_key(c_key, a_key, **params), lambda: solve(c_raw, a_raw, **params))
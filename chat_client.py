@@ -0,0 +1,121 @@
+"""Gemini access shared by app.py and menu.py: model probing with a per-key cache,
+streamed replies (answering the model's tool calls locally), timeouts and retry with
+exponential backoff.
+
+The genai module is injected (any object with configure() and GenerativeModel), and
+the API endpoint can be pointed at a local fake server through GEMINI_ENDPOINT, so
+the whole flow can be exercised without the real service.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+# api key hash -> name of the first model that answered a probe (lives across Streamlit reruns)
+_MODEL_CACHE = {}
+_MODEL_LOCK = threading.Lock()
+log = logging.getLogger(__name__)
+
+
+def _key_id(api_key):
+    return hashlib.sha256(str(api_key).encode('utf-8')).hexdigest()
+
+
+class ChatClient:
+    def __init__(self, genai, timeout=60.0, retries=3, backoff=1.0, probe_timeout=10.0, endpoint=None, sleep=time.sleep):
+        self.genai = genai
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.probe_timeout = probe_timeout
+        self.endpoint = endpoint if endpoint is not None else os.environ.get('GEMINI_ENDPOINT')
+        self.sleep = sleep
+        self.tools = {}   # name -> local function the model may call
+
+    def configure(self, api_key):
+        if self.endpoint:
+            self.genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': self.endpoint})
+        else:
+            self.genai.configure(api_key=api_key)
+
+    # --- model selection ---
+
+    def pick_model(self, api_key, candidates, **model_kwargs):
+        """First candidate that answers a cheap count_tokens probe; cached per API key."""
+        kid = _key_id(api_key)
+        with _MODEL_LOCK:
+            cached = _MODEL_CACHE.get(kid)
+        if cached in candidates: return cached
+        for name in candidates:
+            try:
+                self.genai.GenerativeModel(name, **model_kwargs).count_tokens(
+                    "ping", request_options={'timeout': self.probe_timeout})
+            except Exception as e:
+                log.debug("Model probe failed for %s: %s", name, e)
+                continue
+            with _MODEL_LOCK:
+                _MODEL_CACHE[kid] = name
+            return name
+        return None
+
+    @staticmethod
+    def forget_model(api_key):
+        with _MODEL_LOCK:
+            _MODEL_CACHE.pop(_key_id(api_key), None)
+
+    # --- replies ---
+
+    def use_tools(self, tools):
+        """Registers local functions for stream_reply to run; returns them for GenerativeModel(tools=...)."""
+        self.tools = {f.__name__: f for f in tools}
+        return tools
+
+    def _call_tools(self, calls):
+        """function_call parts -> the user turn carrying their function_response parts."""
+        parts = []
+        for fc in calls:
+            # מספרים מגיעים מה-API כ-float
+            args = {k: int(v) if isinstance(v, float) and v.is_integer() else v for k, v in fc.args.items()}
+            try: result = self.tools[fc.name](**args)
+            except Exception as e: result = f"Error: {e}"
+            parts.append({'function_response': {'name': fc.name, 'response': {'result': result}}})
+        return {'role': 'user', 'parts': parts}
+
+    @staticmethod
+    def _rewind(chat, mark):
+        """Drops every turn a failed reply added after history length mark. The failed
+        response goes first through rewind(), since chat.history raises while it is last."""
+        if chat.last is not None: chat.rewind()
+        if len(chat.history) > mark: chat.history = chat.history[:mark]
+
+    def stream_reply(self, chat, prompt, on_text=None):
+        """Sends prompt and returns the full reply, calling on_text(text_so_far) as chunks arrive.
+
+        function_call parts are answered from the registered tools and the reply keeps
+        streaming, so the chat should be started without the SDK's automatic function
+        calling (which cannot stream; such a chat gets one non-streamed reply).
+        Failures before the first chunk are retried with exponential backoff; a failure
+        mid-stream is raised, since the partial answer has already been shown. Either
+        way the failed turns are removed from the chat first, so the session stays usable.
+        """
+        stream = not getattr(chat, 'enable_automatic_function_calling', False)
+        for attempt in range(self.retries + 1):
+            text, mark = "", len(chat.history)
+            try:
+                message = prompt
+                while message is not None:
+                    response = chat.send_message(message, stream=stream, request_options={'timeout': self.timeout})
+                    calls = []
+                    for chunk in response if stream else [response]:
+                        for part in chunk.candidates[0].content.parts if chunk.candidates else []:
+                            if 'function_call' in part: calls.append(part.function_call)
+                            elif part.text:
+                                text += part.text
+                                if on_text: on_text(text)
+                    message = self._call_tools(calls) if calls else None
+                return text
+            except Exception:
+                self._rewind(chat, mark)
+                if text or attempt >= self.retries: raise
+                self.sleep(self.backoff * 2 ** attempt)
@@ -0,0 +1,89 @@
+"""Compact chat context for the results analyst.
+
+The hourly schedule has one row per course-hour, so dumping it into the prompt grows
+with the department. Instead the opening prompt carries one row per placement plus
+summary tables, and detailed questions go through lookup tools that filter the
+DataFrames locally on demand.
+"""
+import pandas as pd
+
+PLACEMENT_COLS = ['Year', 'Semester', 'Day', 'Start', 'End', 'Course', 'Lecturer', 'Space', 'LinkID']
+
+
+def aggregate_placements(schedule):
+    """One row per placement (course, lecturer, semester, day) with Start/End instead of one row per hour."""
+    if schedule is None or schedule.empty: return pd.DataFrame(columns=PLACEMENT_COLS)
+    keys = ['Course', 'Lecturer', 'Semester', 'Day']
+    df = schedule.sort_values(keys + ['Hour'], kind='stable')
+    # בלוק חדש כשהשעה לא רציפה לשעה הקודמת של אותו קורס באותו יום
+    block = (df[keys].ne(df[keys].shift()).any(axis=1) | df['Hour'].diff().ne(1)).cumsum()
+    out = df.groupby(block, sort=False).agg(
+        Year=('Year', 'first'), Semester=('Semester', 'first'), Day=('Day', 'first'),
+        Start=('Hour', 'min'), End=('Hour', 'max'), Course=('Course', 'first'), Lecturer=('Lecturer', 'first'),
+        Space=('Space', 'first'), LinkID=('LinkID', 'first'))
+    out['End'] += 1
+    return out.sort_values(['Semester', 'Day', 'Start', 'Course'], kind='stable').reset_index(drop=True)
+
+
+def lecturer_load(schedule):
+    """Weekly teaching hours and days on campus per lecturer and semester."""
+    if schedule is None or schedule.empty: return pd.DataFrame(columns=['Lecturer', 'Semester', 'Hours', 'Days'])
+    return (schedule.groupby(['Lecturer', 'Semester'])
+            .agg(Hours=('Hour', 'size'), Days=('Day', 'nunique')).reset_index())
+
+
+def year_daily_hours(schedule):
+    """Student-year × day grid of class hours per semester (linked parallel courses count once)."""
+    if schedule is None or schedule.empty: return pd.DataFrame()
+    df = schedule[schedule['Year'].notna()].drop_duplicates(['Year', 'Semester', 'Day', 'Hour'])
+    return df.pivot_table(index=['Year', 'Semester'], columns='Day', values='Hour', aggfunc='size', fill_value=0)
+
+
+def failure_summary(errors):
+    if errors is None or errors.empty: return pd.DataFrame(columns=['Reason', 'Count'])
+    return errors.groupby('Reason').size().reset_index(name='Count').sort_values('Count', ascending=False)
+
+
+def build_chat_context(schedule, errors, max_placements=400, max_errors=200):
+    """Opening-prompt data: placements (when small enough), summaries and failures, as compact CSV."""
+    placements = aggregate_placements(schedule)
+    parts = [f"TOTALS: {len(placements)} placements, {0 if errors is None else len(errors)} failed courses."]
+    if len(placements) <= max_placements:
+        parts.append("PLACEMENTS (Day 1=Sunday, End exclusive):\n" + placements.to_csv(index=False))
+    else:
+        parts.append(f"PLACEMENTS: {len(placements)} rows - too many to list; use the lookup_schedule tool.")
+    parts.append("LECTURER LOAD:\n" + lecturer_load(schedule).to_csv(index=False))
+    parts.append("YEAR DAILY HOURS:\n" + year_daily_hours(schedule).to_csv())
+    parts.append("FAILURE REASONS:\n" + failure_summary(errors).to_csv(index=False))
+    if errors is not None and not errors.empty:
+        shown = errors[['Course', 'Lecturer', 'Reason']].head(max_errors)
+        more = f"\n(+{len(errors) - max_errors} more; use the lookup_failures tool)" if len(errors) > max_errors else ""
+        parts.append("FAILED COURSES:\n" + shown.to_csv(index=False) + more)
+    return "\n\n".join(parts)
+
+
+def make_lookup_tools(schedule, errors, max_rows=200):
+    """Local tools the model can call instead of receiving the full tables up front."""
+    placements = aggregate_placements(schedule)
+    errors = errors if errors is not None else pd.DataFrame(columns=['Course', 'Lecturer', 'Reason', 'LinkID'])
+
+    def _match(df, col, value):
+        """Exact match on the column if anything matches exactly, otherwise substring match."""
+        if not value or col not in df.columns: return df
+        values = df[col].astype(str).str.strip()
+        exact = values == str(value).strip()
+        return df[exact] if exact.any() else df[values.str.contains(str(value).strip(), regex=False, na=False)]
+
+    def lookup_schedule(lecturer: str = "", year: str = "", course: str = "", semester: int = 0, day: int = 0) -> str:
+        """Returns scheduled placements (CSV) filtered by lecturer, student year, course name, semester and day (0 = any)."""
+        df = _match(_match(_match(placements, 'Lecturer', lecturer), 'Year', year), 'Course', course)
+        if semester: df = df[df['Semester'] == semester]
+        if day: df = df[df['Day'] == day]
+        return df.head(max_rows).to_csv(index=False) if not df.empty else "No matching placements."
+
+    def lookup_failures(lecturer: str = "", course: str = "", reason: str = "") -> str:
+        """Returns failed courses (CSV) filtered by lecturer, course name and failure reason."""
+        df = _match(_match(_match(errors, 'Lecturer', lecturer), 'Course', course), 'Reason', reason)
+        return df.head(max_rows).to_csv(index=False) if not df.empty else "No matching failures."
+
+    return [lookup_schedule, lookup_failures]
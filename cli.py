@@ -0,0 +1,81 @@
+"""Headless entry point: python cli.py COURSES AVAILABILITY [-o OUT_DIR] [--format csv|parquet]"""
+import argparse
+import os
+import sys
+
+from cache import ResultCache, cached_solve
+from metrics import Metrics, NULL_METRICS
+from engine import availability_usecols, courses_usecols, load_table, save_table, schedule_diff, solve
+from scoring import DEFAULT_WEIGHTS, score_schedule
+from views import ScheduleViews
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Build a timetable from COURSES and AVAILABILITY files without the UI.")
+    p.add_argument("courses", help="COURSES file (.xlsx / .csv / .parquet)")
+    p.add_argument("availability", help="AVAILABILITY file (.xlsx / .csv / .parquet)")
+    p.add_argument("-o", "--out-dir", default=".", help="Directory for schedule/errors output")
+    p.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    p.add_argument("--iterations", type=int, default=30, help="Number of shuffled restarts")
+    p.add_argument("--seed", type=int, default=None, help="Base seed for reproducible restarts")
+    p.add_argument("--workers", type=int, default=1, help="Parallel restart processes")
+    p.add_argument("--solver", choices=["greedy", "csp"], default="greedy",
+                   help="greedy random restarts, or constraint propagation with local repair")
+    p.add_argument("--previous", default=None,
+                   help="Previous schedule file: keep its still-valid placements and re-place only what changed")
+    p.add_argument("--previous-errors", default=None,
+                   help="Previous errors file: those courses are only placed into free slots")
+    p.add_argument("--time-limit", type=float, default=10.0, help="Time budget in seconds for the csp solver")
+    p.add_argument("--optimize", action="store_true",
+                   help="Among equally failing restarts prefer fewer gaps/campus days/late hours, then improve by local search")
+    p.add_argument("--improve-time", type=float, default=2.0, help="Local search budget in seconds with --optimize")
+    p.add_argument("--rooms", default=None,
+                   help="ROOMS file (חדר / קיבולת / סוג): allocate a room to every non-Zoom course (greedy solver)")
+    p.add_argument("--excel", action="store_true", help="Also write schedule.xlsx with one weekly-grid sheet per student year")
+    p.add_argument("--metrics", default=None, help="Write stage timings and counters to this JSON file")
+    p.add_argument("--cache-dir", default=None, help="Reuse parsed inputs and results stored here by earlier runs")
+    args = p.parse_args(argv)
+
+    try:
+        previous = load_table(args.previous) if args.previous else None
+        previous_errors = load_table(args.previous_errors) if args.previous_errors else None
+        params = dict(iterations=args.iterations, seed=args.seed, workers=args.workers, solver=args.solver,
+                      time_limit=args.time_limit, previous=previous, previous_errors=previous_errors)
+        metrics = Metrics() if args.metrics else NULL_METRICS
+        if args.rooms: params['rooms_raw'] = load_table(args.rooms)
+        if args.optimize: params.update(weights=DEFAULT_WEIGHTS, improve_time=args.improve_time)
+        if args.cache_dir:
+            sched, errors, info = cached_solve(args.courses, args.availability,
+                                               ResultCache(disk_dir=args.cache_dir), metrics=metrics, **params)
+        else:
+            with metrics.stage('load_files'):
+                courses_raw = load_table(args.courses, courses_usecols)
+                avail_raw = load_table(args.availability, availability_usecols)
+            sched, errors, info = solve(courses_raw, avail_raw, metrics=metrics, **params)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    save_table(sched, os.path.join(args.out_dir, f"schedule.{args.format}"))
+    save_table(errors, os.path.join(args.out_dir, f"errors.{args.format}"))
+    if args.excel:
+        with open(os.path.join(args.out_dir, "schedule.xlsx"), 'wb') as f: f.write(ScheduleViews(sched, errors).to_excel())
+    if previous is not None:
+        diff = schedule_diff(previous, sched)
+        save_table(diff, os.path.join(args.out_dir, f"changes.{args.format}"))
+        print(f"Changed placements: {len(diff)}")
+    if info['missing_lecturers']:
+        print(f"Warning: {len(info['missing_lecturers'])} lecturers missing availability", file=sys.stderr)
+    n_sched = len(sched.drop_duplicates(subset=['Course', 'Lecturer'])) if not sched.empty else 0
+    print(f"Scheduled: {n_sched}  Failed: {len(errors)}  Seed: {info['seed']}")
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f: f.write(metrics.to_json(indent=2))
+    score = score_schedule(sched)
+    print("Quality score: {score} (year gaps {year_gaps}, lecturer days {lecturer_days}, "
+          "late hours {late_hours}, load balance {load_balance})".format(**score))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
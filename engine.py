@@ -0,0 +1,647 @@
+"""Streamlit-free scheduling engine: loading, preprocessing, Scheduler and restarts."""
+import codecs
+import io
+import os
+import time
+import numpy as np
+import pandas as pd
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from feasibility import analyze_feasibility
+from metrics import MAX_EVENTS, NULL_METRICS, Metrics
+from rooms import NO_ROOM, RoomInventory, preprocess_rooms
+from scoring import ScoreState, improve
+
+# ================= 1. UTILS =================
+
+def safe_str(val):
+    if val is None or pd.isna(val): return None
+    try:
+        if isinstance(val, (dict, list, tuple, set)): return str(val)
+        s = str(val).strip()
+        if s.lower() in ['nan', 'none', '', 'null']: return None
+        return s
+    except: return ""
+
+def clean_semester(val):
+    s = str(val).strip().replace("'", "").replace('"', "")
+    if s in ['א', 'A', 'a', '1']: return 1
+    if s in ['ב', 'B', 'b', '2']: return 2
+    if s in ['ג', 'C', 'c', '3']: return 3
+    try: return int(float(s))
+    except: return 1
+
+COURSE_COLUMNS = {'מרצה': 'Lecturer', 'שם קורס': 'Course', 'שעות': 'Duration', 'סמסטר': 'Semester',
+                  'קישור': 'LinkID', 'אילוץ יום': 'FixDay', 'אילוץ שעה': 'FixHour', 'מרחב': 'Space', 'שנה': 'Year',
+                  'משתתפים': 'Students'}
+CSV_CHUNK_ROWS = 50_000
+ENCODING_PREFIX = 64 * 1024
+
+def courses_usecols(col):
+    """usecols filter for COURSES files: only the columns preprocess_courses maps."""
+    return str(col).strip() in COURSE_COLUMNS
+
+def availability_usecols(col):
+    """usecols filter for AVAILABILITY files: name candidates and the "DS" day/semester columns."""
+    c = str(col).strip()
+    return c.isdigit() or "שם" in c or "מרצה" in c
+
+def detect_encoding(prefix):
+    """utf-8-sig / utf-8 / cp1255 (Hebrew Windows exports) judged from the first bytes of a file."""
+    if prefix.startswith(codecs.BOM_UTF8): return 'utf-8-sig'
+    try: codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+    except UnicodeDecodeError: return 'cp1255'
+    return 'utf-8'
+
+def _excel_engine():
+    try: import python_calamine  # noqa: F401 - קורא xlsx מהיר (Rust), אם מותקן
+    except ImportError: return None
+    return 'calamine'
+
+def load_table(src, usecols=None):
+    """Reads a CSV/Excel/Parquet path or file-like object into a DataFrame.
+
+    usecols (a column-name predicate such as courses_usecols) skips every other column
+    while parsing. CSV encoding is detected from a prefix and the stream rewound, and
+    CSV is parsed in chunks whose blank rows are dropped before concatenation.
+    """
+    if src is None: return None
+    filename = str(getattr(src, 'name', src))
+    if filename.endswith('.csv'):
+        if isinstance(src, (str, os.PathLike)):
+            with open(src, 'rb') as f: prefix = f.read(ENCODING_PREFIX)
+        else:
+            pos = src.tell() if hasattr(src, 'tell') else 0
+            prefix = src.read(ENCODING_PREFIX)
+            src.seek(pos)
+        chunks = pd.read_csv(src, encoding=detect_encoding(prefix), usecols=usecols, chunksize=CSV_CHUNK_ROWS)
+        parts = [c.dropna(how='all') for c in chunks]
+        return pd.concat(parts) if len(parts) > 1 else parts[0] if parts else pd.DataFrame()
+    if filename.endswith('.parquet'):
+        if usecols is None: return pd.read_parquet(src)
+        import pyarrow.parquet as pq
+        names = pq.ParquetFile(src).schema_arrow.names
+        if hasattr(src, 'seek'): src.seek(0)
+        return pd.read_parquet(src, columns=[c for c in names if usecols(c)])
+    engine = _excel_engine()
+    try: return pd.read_excel(src, usecols=usecols, engine=engine)
+    except ValueError:
+        if engine is None: raise
+        # גרסת pandas ישנה בלי מנוע calamine
+        if hasattr(src, 'seek'): src.seek(0)
+        return pd.read_excel(src, usecols=usecols)
+
+def save_table(df, path):
+    """Writes a DataFrame as CSV (utf-8-sig, Excel friendly) or Parquet, by file extension."""
+    if str(path).endswith('.parquet'): df.to_parquet(path, index=False)
+    else: df.to_csv(path, index=False, encoding='utf-8-sig')
+
+def parquet_bytes(df):
+    """DataFrame as Parquet bytes for a download button, or None when no Parquet engine is installed."""
+    try:
+        buf = io.BytesIO()
+        df.to_parquet(buf, index=False)
+        return buf.getvalue()
+    except ImportError: return None
+
+def parse_availability(row, cols, metrics=NULL_METRICS):
+    for col in cols:
+        val = row[col]
+        if pd.isna(val): continue
+        s_col = str(col).strip()
+        if len(s_col) < 2 or not s_col[:2].isdigit(): continue
+        try:
+            day = int(s_col[0])
+            semester = int(s_col[1])
+            if not (1 <= day <= 7): continue
+            parts = str(val).replace(';', ',').split(',')
+            for p in parts:
+                p = p.strip()
+                if '-' in p:
+                    p_split = p.split('-')
+                    start = int(float(p_split[0]))
+                    end = int(float(p_split[1]))
+                    for h in range(start, end):
+                        yield (semester, day, h)
+        except (ValueError, IndexError, OverflowError) as e:
+            metrics.event('availability_parse_error', column=s_col, value=str(val), error=str(e))
+            continue
+
+# ================= 2. PRE-PROCESSING =================
+
+def preprocess_courses(df):
+    df = df.dropna(how='all')
+    df.columns = df.columns.str.strip()
+    col_map = {col: COURSE_COLUMNS[str(col).strip()] for col in df.columns if str(col).strip() in COURSE_COLUMNS}
+    df = df.rename(columns=col_map)
+    if 'Course' not in df.columns or 'Lecturer' not in df.columns: return pd.DataFrame()
+    df = df[df['Course'].notna() & df['Lecturer'].notna()]
+    for col in ['Course', 'Lecturer', 'Space', 'LinkID', 'Year']:
+        if col not in df.columns: df[col] = None
+        df[col] = df[col].apply(safe_str)
+    if 'Semester' in df.columns: df['Semester'] = df['Semester'].apply(clean_semester)
+    else: df['Semester'] = 1
+    if 'Duration' in df.columns: df['Duration'] = pd.to_numeric(df['Duration'], errors='coerce').fillna(2).astype(int)
+    else: df['Duration'] = 2
+    for col in ['FixDay', 'FixHour', 'Students']:
+        if col in df.columns: df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        else: df[col] = None
+    return df
+
+def preprocess_availability(df, metrics=NULL_METRICS):
+    df = df.dropna(how='all')
+    df.columns = df.columns.str.strip()
+    lecturer_col = None
+    for col in df.columns:
+        if str(col).strip() == "שם מלא": lecturer_col = col; break
+    if not lecturer_col:
+        for col in df.columns:
+            if "שם" in str(col) or "מרצה" in str(col): lecturer_col = col; break
+    if not lecturer_col: raise ValueError("No 'Full Name' column found in availability file.")
+    df = df.rename(columns={lecturer_col: 'Lecturer'})
+    df['Lecturer'] = df['Lecturer'].apply(safe_str)
+    df = df[df['Lecturer'].notna()]
+    avail_cols = [c for c in df.columns if str(c).isdigit()]
+    names = [" ".join(lec.split()) if lec else None for lec in df['Lecturer']]
+    slots = expand_availability(df, avail_cols, metrics)
+    counts = np.bincount(slots['row'].to_numpy(), minlength=len(df))
+    avail_db = {}
+    sparsity = {}
+    for lec, count in zip(names, counts):
+        if not lec: continue
+        avail_db.setdefault(lec, {})
+        sparsity[lec] = int(count)
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+    uniques = uniques.tolist()
+    slots = slots[codes[slots['row'].to_numpy()] >= 0] if len(slots) else slots
+    if len(slots):
+        # מיון לפי (מרצה, סמסטר, יום) ופיצול לקבוצות - לולאת פייתון אחת לכל קבוצה ולא לכל שעה
+        key = (codes[slots['row'].to_numpy()].astype(np.int64) * 10 + slots['sem'].to_numpy()) * 10 + slots['day'].to_numpy()
+        order = np.argsort(key, kind='stable')
+        key, hours = key[order], slots['hour'].to_numpy()[order]
+        bounds = np.flatnonzero(np.diff(key)) + 1
+        for k, hrs in zip(key[np.r_[0, bounds]].tolist(), np.split(hours, bounds)):
+            lec = uniques[k // 100]
+            avail_db[lec].setdefault(k // 10 % 10, {})[k % 10] = set(hrs.tolist())
+    return avail_db, sparsity
+
+def expand_availability(df, avail_cols, metrics=NULL_METRICS):
+    """Vectorized parse of the availability cells into one (row, sem, day, hour) row per free hour.
+
+    Same rules as parse_availability: column "DS" is day D / semester S, a cell holds
+    "start-end" ranges (end exclusive) split by ',' or ';', parts without '-' are
+    ignored and a malformed range drops the rest of its cell.
+    """
+    cols = [c for c in avail_cols if len(str(c).strip()) >= 2 and 1 <= int(str(c).strip()[0]) <= 7]
+    empty = pd.DataFrame({'row': pd.Series(dtype=int), 'sem': pd.Series(dtype=int),
+                          'day': pd.Series(dtype=int), 'hour': pd.Series(dtype=int)})
+    if not cols or df.empty: return empty
+    wide = df[cols].copy()
+    wide.columns = range(len(cols))
+    wide['row'] = np.arange(len(df))
+    cells = wide.melt(id_vars='row', var_name='col', value_name='val').dropna(subset=['val'])
+    parts = cells.assign(part=cells['val'].astype(str).str.split(r'[,;]', regex=True)).explode('part')
+    parts['pos'] = parts.groupby(level=0).cumcount()
+    fields = parts['part'].str.extract(r'^([^-]*)-([^-]*)')
+    has_range = fields[0].notna().to_numpy()
+    parts, fields = parts[has_range], fields[has_range]
+    if parts.empty: return empty
+    start = pd.to_numeric(fields[0], errors='coerce').to_numpy(dtype=float)
+    end = pd.to_numeric(fields[1], errors='coerce').to_numpy(dtype=float)
+    bad = ~(np.isfinite(start) & np.isfinite(end))
+    # טווח פגום עוצר את המשך התא (כמו ה-try בגרסה השורתית)
+    cutoff = parts['pos'][bad].groupby(level=0).min().reindex(parts.index).fillna(np.inf).to_numpy()
+    keep = ~bad & (parts['pos'].to_numpy() < cutoff)
+    if metrics.enabled:
+        for r, val, part in zip(parts['row'][bad], parts['val'][bad], parts['part'][bad]):
+            metrics.event('availability_parse_error', row=int(r), value=str(val), part=str(part))
+        metrics.count('availability_parts_dropped', int((~keep & ~bad).sum()))
+    parts = parts[keep]
+    start, end = np.trunc(start[keep]).astype(np.int64), np.trunc(end[keep]).astype(np.int64)
+    n = np.clip(end - start, 0, None)
+    idx = np.repeat(np.arange(len(parts)), n)
+    hours = start[idx] + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    col_names = [str(c).strip() for c in cols]
+    col_idx = parts['col'].to_numpy(dtype=np.int64)[idx]
+    return pd.DataFrame({
+        'row': parts['row'].to_numpy(dtype=np.int64)[idx],
+        'sem': np.array([int(c[1]) for c in col_names], dtype=np.int64)[col_idx],
+        'day': np.array([int(c[0]) for c in col_names], dtype=np.int64)[col_idx],
+        'hour': hours,
+    })
+
+def build_avail_masks(avail_db):
+    """Compact form of avail_db: (lecturer, semester, day) -> bitmask of available hours."""
+    masks = {}
+    for lec, sems in avail_db.items():
+        for sem, days in sems.items():
+            for day, hours in days.items():
+                m = 0
+                for h in hours:
+                    if h >= 0: m |= 1 << h
+                masks[(lec, sem, day)] = m
+    return masks
+
+# ================= 3. SCHEDULER ENGINE =================
+
+class CourseRecord:
+    """One preprocessed COURSES row. Lecturer is whitespace-normalized, missing FixDay/FixHour are None."""
+    __slots__ = ('Lecturer', 'Course', 'Duration', 'Semester', 'LinkID', 'FixDay', 'FixHour', 'Space', 'Year', 'Students',
+                 'Sparsity', 'Row')
+
+    def __init__(self, **fields):
+        for k in self.__slots__: setattr(self, k, fields.get(k))
+
+    def __getitem__(self, key): return getattr(self, key)
+
+    def get(self, key, default=None): return getattr(self, key, default)
+
+class SchedulingInstance:
+    """Everything Scheduler.run needs from the courses frame, built once and shared by all restarts.
+
+    hard: LinkID/FixDay/FixHour records in file order; soft: the rest, sorted by
+    (Sparsity asc, Duration desc) for the deterministic run; links: LinkID -> group;
+    rooms: RoomPlan bound to the records when a room inventory is given.
+    """
+    def __init__(self, courses, sparsity, avail_masks=None, rooms=None):
+        self.records = []
+        for i, r in enumerate(courses.to_dict('records')):
+            rec = CourseRecord(**r)
+            rec.Row = i
+            rec.Lecturer = " ".join(str(rec.Lecturer).split())
+            if pd.isna(rec.FixDay): rec.FixDay = None
+            if pd.isna(rec.FixHour): rec.FixHour = None
+            rec.Sparsity = int(sparsity.get(rec.Lecturer, 0) or 0)
+            self.records.append(rec)
+        self.links = {}
+        self.hard, soft = [], []
+        for rec in self.records:
+            if pd.notna(rec.LinkID): self.links.setdefault(rec.LinkID, []).append(rec)
+            if pd.notna(rec.LinkID) or rec.FixDay is not None or rec.FixHour is not None: self.hard.append(rec)
+            else: soft.append(rec)
+        self.soft = soft
+        self.soft_sorted = sorted(soft, key=lambda r: (r.Sparsity, -r.Duration))
+        self.rooms = rooms.bind(self.records) if rooms is not None else None
+        self.feasibility = analyze_feasibility(self, avail_masks) if avail_masks is not None else None
+
+    def soft_order(self, shuffle=False, seed=None):
+        if not shuffle: return self.soft_sorted
+        # אותה פרמוטציה כמו sample(frac=1, random_state=seed)
+        rs = np.random.RandomState(seed) if seed is not None else np.random
+        return [self.soft[i] for i in rs.permutation(len(self.soft))]
+
+class CompactSchedule:
+    """Scheduler output as columns with one entry per placed course (record row, semester, day,
+    start, duration, room index or NO_ROOM) and one per failed course. Hourly rows are only built by to_frames()."""
+    SCHEDULE_COLS = ['Year', 'Semester', 'Day', 'Hour', 'Course', 'Lecturer', 'Space', 'LinkID']
+
+    def __init__(self):
+        self.row, self.sem, self.day = array('i'), array('i'), array('i')
+        self.start, self.dur, self.room = array('i'), array('i'), array('i')
+        self.err_row, self.err_reason = array('i'), []
+
+    def add(self, row, sem, day, start_h, dur, room=NO_ROOM):
+        self.row.append(row); self.sem.append(sem); self.day.append(day)
+        self.start.append(start_h); self.dur.append(dur); self.room.append(room)
+
+    def fail(self, row, reason):
+        self.err_row.append(row); self.err_reason.append(reason)
+
+    @property
+    def n_errors(self): return len(self.err_row)
+
+    def copy(self):
+        out = CompactSchedule()
+        out.row, out.sem, out.day = array('i', self.row), array('i', self.sem), array('i', self.day)
+        out.start, out.dur, out.room = array('i', self.start), array('i', self.dur), array('i', self.room)
+        out.err_row, out.err_reason = array('i', self.err_row), list(self.err_reason)
+        return out
+
+    def to_frames(self, records, rooms=None):
+        """(hourly schedule, errors) frames, identical to the old one-dict-per-hour output.
+
+        With a RoomPlan the schedule gets a Room column (None for Zoom).
+        """
+        if len(self.row):
+            dur = np.frombuffer(self.dur, dtype=np.int32).astype(np.int64)
+            idx = np.repeat(np.arange(len(dur)), dur)
+            offset = np.arange(len(idx)) - np.repeat(np.cumsum(dur) - dur, dur)
+            recs = [records[i] for i in self.row]
+            col = lambda name: np.array([getattr(r, name) for r in recs], dtype=object)[idx]
+            sched = pd.DataFrame({
+                'Year': col('Year'), 'Semester': np.frombuffer(self.sem, dtype=np.int32).astype(np.int64)[idx],
+                'Day': np.frombuffer(self.day, dtype=np.int32).astype(np.int64)[idx],
+                'Hour': np.frombuffer(self.start, dtype=np.int32).astype(np.int64)[idx] + offset,
+                'Course': col('Course'), 'Lecturer': col('Lecturer'), 'Space': col('Space'), 'LinkID': col('LinkID'),
+            })
+            if rooms is not None:
+                names = np.array(rooms.names + [None], dtype=object)   # NO_ROOM (-1) -> None
+                sched['Room'] = names[np.frombuffer(self.room, dtype=np.int32)[idx]]
+        else: sched = pd.DataFrame()
+        if self.err_row:
+            recs = [records[i] for i in self.err_row]
+            errors = pd.DataFrame({'Course': [r.Course for r in recs], 'Lecturer': [r.Lecturer for r in recs],
+                                   'Reason': self.err_reason, 'LinkID': [r.LinkID for r in recs]})
+        else: errors = pd.DataFrame()
+        return sched, errors
+
+class Scheduler:
+    def __init__(self, courses, avail_db, sparsity, avail_masks=None, instance=None, metrics=NULL_METRICS, rooms=None):
+        self.courses = courses
+        self.avail_db = avail_db
+        self.avail_masks = avail_masks if avail_masks is not None else build_avail_masks(avail_db)
+        self.sparsity = sparsity
+        self.instance = instance if instance is not None else SchedulingInstance(courses, sparsity, self.avail_masks, rooms)
+        if self.instance.feasibility is None: self.instance.feasibility = analyze_feasibility(self.instance, self.avail_masks)
+        self.result = CompactSchedule()
+        self.busy = {}      # (year, sem, day) -> bitmask of busy hours
+        self.lec_busy = {}  # (lecturer, sem, day) -> bitmask of busy hours
+        self.rooms = self.instance.rooms
+        self.room_busy = {} # (sem, day, hour) -> bitmask of booked rooms
+        self.room_blocked = False
+        self.processed_links = set()
+        self.metrics = metrics
+        if metrics.enabled: self.check_valid = self._check_valid_counted
+        
+    def is_student_busy(self, year, sem, day, h):
+        return bool(self.busy.get((year, sem, day), 0) >> h & 1)
+    
+    def set_student_busy(self, year, sem, day, h):
+        if not year: return
+        key = (year, sem, day)
+        self.busy[key] = self.busy.get(key, 0) | (1 << h)
+
+    def run(self, shuffle=False, seed=None):
+        return self.run_compact(shuffle, seed).to_frames(self.instance.records, self.rooms)
+
+    def run_compact(self, shuffle=False, seed=None):
+        waves = [self.instance.hard, self.instance.soft_order(shuffle, seed)]
+        links = self.instance.links
+        self.result = CompactSchedule()
+        self.busy = {}
+        self.lec_busy = {}
+        self.room_busy = {}
+        self.processed_links = set()
+        for wave in waves:
+            for row in wave:
+                try:
+                    lid = row.LinkID
+                    if lid and lid in self.processed_links: continue
+                    group = [row]
+                    if lid:
+                        group = links.get(lid, [])
+                        self.processed_links.add(lid)
+                    self.attempt_schedule(row, group)
+                except Exception as e:
+                    self.metrics.event('scheduler_error', row=row.Row, course=row.Course, error=repr(e))
+                    continue
+        return self.result
+
+    def attempt_schedule(self, main_row, group):
+        feas = self.instance.feasibility
+        if main_row.Row in feas.reasons:
+            self.metrics.count('skipped_infeasible', len(group))
+            self.fail(group, feas.reasons[main_row.Row]); return
+        self.place(main_row, group, feas.domains[main_row.Row])
+
+    def place(self, main_row, group, domain):
+        """Commits the group at the first (day, start_h) of domain that passes check_valid, else fails it."""
+        dur = int(main_row.Duration)
+        sem = int(main_row.Semester)
+        self.room_blocked = False
+        for day, start_h in domain:
+            if self.check_valid(group, sem, day, start_h, dur):
+                self.commit(group, sem, day, start_h, dur); return
+        reason = "No Time Slot Found"
+        if main_row.FixDay is not None: reason += " [Day Constraint]"
+        elif self.room_blocked: reason += " [Rooms Full]"
+        self.fail(group, reason)
+
+    def check_valid(self, group, sem, day, start_h, dur):
+        span = ((1 << dur) - 1) << start_h
+        for item in group:
+            lec = item.Lecturer
+            year = item.Year
+            if span & ~self.avail_masks.get((lec, sem, day), 0): return False
+            if self.lec_busy.get((lec, sem, day), 0) & span: return False
+            if year and self.busy.get((year, sem, day), 0) & span: return False
+        if self.rooms is not None and self.rooms.assign(group, self.room_busy, sem, day, start_h, dur) is None:
+            self.room_blocked = True; return False
+        return True
+
+    def _check_valid_counted(self, group, sem, day, start_h, dur):
+        # כמו check_valid, עם ספירת משבצות שנבדקו ודחיות לפי סיבה (רק כשהמדידה פעילה)
+        count = self.metrics.count
+        count('candidate_slots')
+        span = ((1 << dur) - 1) << start_h
+        for item in group:
+            if span & ~self.avail_masks.get((item.Lecturer, sem, day), 0): count('reject_unavailable'); return False
+            if self.lec_busy.get((item.Lecturer, sem, day), 0) & span: count('reject_lecturer_busy'); return False
+            if item.Year and self.busy.get((item.Year, sem, day), 0) & span: count('reject_year_busy'); return False
+        if self.rooms is not None and self.rooms.assign(group, self.room_busy, sem, day, start_h, dur) is None:
+            self.room_blocked = True; count('reject_no_room'); return False
+        return True
+
+    def commit(self, group, sem, day, start_h, dur):
+        span = ((1 << dur) - 1) << start_h
+        rooms = [NO_ROOM] * len(group)
+        if self.rooms is not None:
+            # הקצאת חדרים מהאינדקס לפי (סמסטר, יום, שעה) - החדר הפנוי הקטן ביותר שמתאים
+            rooms = self.rooms.assign(group, self.room_busy, sem, day, start_h, dur)
+            self.rooms.book(self.room_busy, sem, day, start_h, dur, rooms)
+        for item, room in zip(group, rooms):
+            self.result.add(item.Row, sem, day, start_h, dur, room)
+            key = (item.Lecturer, sem, day)
+            self.lec_busy[key] = self.lec_busy.get(key, 0) | span
+            if item.Year:
+                key = (item.Year, sem, day)
+                self.busy[key] = self.busy.get(key, 0) | span
+
+    def fail(self, group, reason):
+        self.metrics.count('failed_courses', len(group))
+        for item in group:
+            self.result.fail(item.Row, reason)
+
+# ================= 3b. RESTARTS =================
+
+_WORKER_ARGS = None
+
+def _init_restart_worker(courses, avail_db, sparsity, avail_masks, instance, weights=None, instrument=False):
+    global _WORKER_ARGS
+    _WORKER_ARGS = (courses, avail_db, sparsity, avail_masks, instance, weights, instrument)
+
+def _run_restart(i, seed):
+    """One restart -> (i, n_errors, score, CompactSchedule, stats); stats is None unless instrumented."""
+    courses, avail_db, sparsity, avail_masks, instance, weights, instrument = _WORKER_ARGS
+    m = Metrics() if instrument else NULL_METRICS
+    t0 = time.perf_counter()
+    res = Scheduler(courses, avail_db, sparsity, avail_masks, instance, m).run_compact(shuffle=(i > 0), seed=seed)
+    cost = ScoreState(instance, res, weights).total() if weights is not None else 0
+    stats = None
+    if instrument:
+        stats = {'restart': i, 'seed': seed, 'errors': res.n_errors, 'score': cost, 'placed': len(res.row),
+                 'wall_s': round(time.perf_counter() - t0, 6), 'counters': m.counters, 'events': m.events}
+    return i, res.n_errors, cost, res, stats
+
+def new_seed():
+    """Fresh base seed from OS entropy (NumPy's global state is shared by forked workers)."""
+    return int(np.random.SeedSequence().entropy % 2 ** 32)
+
+def restart_seed(base_seed, i):
+    """Seed for restart i (restart 0 is the deterministic sparsity-sorted run)."""
+    if base_seed is None or i == 0: return None
+    return (int(base_seed) + i) % (2 ** 32)
+
+def run_restarts(courses, avail_db, sparsity, iterations=30, seed=None, workers=1, on_progress=None,
+                 weights=None, improve_time=0.0, metrics=NULL_METRICS, rooms=None):
+    """Runs iterations + 1 scheduling attempts and returns the best (schedule, errors).
+
+    See run_restarts_compact for the selection rules.
+    """
+    instance, res = run_restarts_compact(courses, avail_db, sparsity, iterations, seed, workers, on_progress,
+                                         weights, improve_time, metrics, rooms)
+    with metrics.stage('to_frames'): return res.to_frames(instance.records, instance.rooms)
+
+def run_restarts_compact(courses, avail_db, sparsity, iterations=30, seed=None, workers=1, on_progress=None,
+                         weights=None, improve_time=0.0, metrics=NULL_METRICS, rooms=None):
+    """Runs iterations + 1 scheduling attempts; returns (SchedulingInstance, best CompactSchedule).
+
+    Ties are broken by the lowest restart index, so for a fixed seed the result
+    is the same whether the restarts run sequentially or over a process pool.
+    With weights (see scoring.DEFAULT_WEIGHTS) every restart is run and ties in the
+    error count go to the lowest soft-constraint score; improve_time seconds of
+    local search are then spent on the winner. rooms (a RoomInventory) adds room
+    allocation and a Room column. With seed=None a base seed is drawn once here, so
+    every restart (in any worker) gets its own explicit seed.
+    """
+    if seed is None: seed = new_seed()
+    with metrics.stage('avail_masks'): avail_masks = build_avail_masks(avail_db)
+    with metrics.stage('instance_and_feasibility'): instance = SchedulingInstance(courses, sparsity, avail_masks, rooms)
+    total = iterations + 1
+    best = (float('inf'), 0, total, CompactSchedule())
+    stop_at_zero = weights is None
+    args = (courses, avail_db, sparsity, avail_masks, instance, weights, metrics.enabled)
+
+    def record(stats):
+        if stats is None: return
+        metrics.merge(stats.pop('counters'))   # כולל כבר את הספירה של כל event
+        for e in stats.pop('events'):
+            if len(metrics.events) < MAX_EVENTS: metrics.events.append({**e, 'restart': stats['restart']})
+        metrics.add_restart(stats)
+
+    with metrics.stage('restarts'):
+        if workers <= 1:
+            _init_restart_worker(*args)
+            for i in range(total):
+                if on_progress: on_progress(i / total)
+                _, n, cost, res, stats = _run_restart(i, restart_seed(seed, i))
+                record(stats)
+                if (n, cost) < best[:2]:
+                    best = (n, cost, i, res)
+                    if n == 0 and stop_at_zero: break
+        else:
+            done = 0
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_restart_worker, initargs=args) as pool:
+                futures = {pool.submit(_run_restart, i, restart_seed(seed, i)): i for i in range(total)}
+                for fut in as_completed(futures):
+                    if fut.cancelled(): continue
+                    i, n, cost, res, stats = fut.result()
+                    record(stats)
+                    done += 1
+                    if on_progress: on_progress(done / total)
+                    if (n, cost, i) < best[:3]:
+                        best = (n, cost, i, res)
+                        if n == 0 and stop_at_zero:
+                            # אין טעם להמשיך ריצות מאוחרות יותר - רק מוקדמות יותר יכולות לנצח
+                            for f, j in futures.items():
+                                if j > i: f.cancel()
+    for stats in metrics.restarts: stats['best'] = stats['restart'] == best[2]
+    res = best[3]
+    if weights is not None and improve_time:
+        with metrics.stage('local_search'): res = improve(instance, res, weights, improve_time, seed=seed)[0]
+    return instance, res
+
+# ================= 4. PIPELINE =================
+
+def normalize_name(x):
+    return " ".join(str(x).split())
+
+def prepare_courses(courses, avail_db):
+    """Keeps only courses whose lecturer has availability. Returns (courses, missing lecturers)."""
+    courses = courses.copy()
+    courses['Lecturer'] = courses['Lecturer'].apply(normalize_name)
+    mask = courses['Lecturer'].isin(set(avail_db.keys()))
+    missing = list(courses[~mask]['Lecturer'].unique())
+    return courses[mask].copy(), missing
+
+def run_solver(courses, avail_db, sparsity, solver='greedy', iterations=30, seed=None, workers=1,
+               time_limit=10.0, on_progress=None, previous=None, previous_errors=None, weights=None,
+               improve_time=0.0, metrics=NULL_METRICS, rooms=None):
+    """Dispatches to the greedy restart runner or the constraint-propagation solver.
+
+    Passing a previous hourly schedule re-schedules incrementally (always with the
+    csp solver): placements that are still legal stay where they were. weights and
+    improve_time turn on score-based selection and local search for the greedy runner.
+    Room allocation (rooms) is only implemented by the greedy runner.
+    """
+    if solver == 'csp' or previous is not None:
+        if rooms is not None: raise ValueError("Room allocation needs the greedy solver without a previous schedule.")
+        from solver import CSPSolver
+        with metrics.stage('csp'):
+            csp = CSPSolver(courses, avail_db, sparsity, time_limit=time_limit)
+            out = csp.run(previous, previous_errors)
+        metrics.merge({'csp_evaluations': csp.evaluations, 'csp_repairs': csp.repairs, 'csp_kept': csp.kept})
+        return out
+    if solver != 'greedy': raise ValueError(f"Unknown solver: {solver}")
+    return run_restarts(courses, avail_db, sparsity, iterations, seed=seed, workers=workers, on_progress=on_progress,
+                        weights=weights, improve_time=improve_time, metrics=metrics, rooms=rooms)
+
+def solve(courses_raw, avail_raw, iterations=30, seed=None, workers=1, on_progress=None,
+          solver='greedy', time_limit=10.0, previous=None, previous_errors=None, weights=None, improve_time=0.0,
+          metrics=NULL_METRICS, rooms_raw=None):
+    """Full pipeline from raw COURSES/AVAILABILITY frames to the best (schedule, errors, info).
+
+    With metrics=Metrics() the stage timings and counters end up in info['metrics'].
+    rooms_raw is an optional ROOMS frame (see rooms.py). info['seed'] is the base seed
+    used (drawn when seed=None), so passing it back reproduces the run.
+    """
+    if seed is None: seed = new_seed()
+    with metrics.stage('preprocess_availability'): avail_db, sparsity = preprocess_availability(avail_raw, metrics)
+    if not avail_db: raise ValueError("Availability file has no lecturers.")
+    with metrics.stage('preprocess_courses'): courses = preprocess_courses(courses_raw)
+    if courses.empty: raise ValueError("Courses file invalid.")
+    with metrics.stage('prepare_courses'): final_courses, missing = prepare_courses(courses, avail_db)
+    rooms = RoomInventory(preprocess_rooms(rooms_raw)) if rooms_raw is not None else None
+    if final_courses.empty: raise ValueError("No courses to schedule (0 matches).")
+    sched, errors = run_solver(final_courses, avail_db, sparsity, solver, iterations, seed=seed,
+                               workers=workers, time_limit=time_limit, on_progress=on_progress,
+                               previous=previous, previous_errors=previous_errors, weights=weights,
+                               improve_time=improve_time, metrics=metrics, rooms=rooms)
+    info = {'missing_lecturers': missing, 'courses': len(final_courses), 'seed': seed}
+    if metrics.enabled: info['metrics'] = metrics.to_dict()
+    return sched, errors, info
+
+def schedule_diff(old, new):
+    """Per-course changes between two hourly schedules: added, removed or moved placements."""
+    def blocks(df):
+        if df is None or df.empty: return {}
+        g = df.assign(Lecturer=df['Lecturer'].apply(normalize_name)).groupby(['Course', 'Lecturer'])
+        return {k: sorted(set(zip(v['Semester'], v['Day'], v['Hour']))) for k, v in g}
+    a, b = blocks(old), blocks(new)
+    rows = []
+    for key in sorted(set(a) | set(b), key=str):
+        if a.get(key) == b.get(key): continue
+        change = 'added' if key not in a else 'removed' if key not in b else 'moved'
+        rows.append({'Course': key[0], 'Lecturer': key[1], 'Change': change,
+                     'Old': _fmt_slots(a.get(key)), 'New': _fmt_slots(b.get(key))})
+    return pd.DataFrame(rows, columns=['Course', 'Lecturer', 'Change', 'Old', 'New'])
+
+def _fmt_slots(slots):
+    """[(sem, day, hour), ...] -> 'S1 D3 10-12' style blocks of consecutive hours."""
+    if not slots: return None
+    out = []
+    for sem, day, h in slots:
+        if out and out[-1][:2] == [sem, day] and out[-1][3] == h: out[-1][3] = h + 1
+        else: out.append([sem, day, h, h + 1])
+    return "; ".join(f"S{s} D{d} {a}-{b}" for s, d, a, b in out)
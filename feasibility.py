@@ -0,0 +1,89 @@
+"""Feasibility analysis run once per instance, before any search.
+
+For every placement unit (a single course row or a whole LinkID group) it computes
+the static domain: the (day, start_h) slots, in the greedy search order, where every
+lecturer of the unit is available for the full duration. Units with an empty domain
+can never be placed by any restart, so they get a precise failure reason here and
+the search skips them.
+"""
+import pandas as pd
+
+DAYS = [1, 2, 3, 4, 5]
+FIRST_HOUR, LAST_HOUR = 8, 22
+
+
+class Feasibility:
+    """domains: main row -> [(day, start_h), ...]; reasons: main row -> failure reason for
+    units that cannot be placed at all; groups: main row -> unit records."""
+
+    def __init__(self):
+        self.domains = {}
+        self.reasons = {}
+        self.groups = {}
+
+    def report(self):
+        """Provably infeasible courses with their reasons, one row per course."""
+        rows = [{'Course': item.Course, 'Lecturer': item.Lecturer, 'Reason': reason, 'LinkID': item.LinkID}
+                for row, reason in self.reasons.items() for item in self.groups[row]]
+        return pd.DataFrame(rows, columns=['Course', 'Lecturer', 'Reason', 'LinkID'])
+
+
+def candidate_order(row, dur):
+    """(days, hours) in the order the greedy scheduler tries them."""
+    days = [int(row.FixDay)] if row.FixDay is not None else DAYS
+    hours = list(range(FIRST_HOUR, LAST_HOUR))
+    if str(row.Space).lower() == 'zoom': hours.reverse()
+    if row.FixHour is not None: hours = [int(row.FixHour)]
+    return days, [h for h in hours if h + dur <= LAST_HOUR]
+
+
+def unit_domain(row, group, avail_masks, dur, sem):
+    days, hours = candidate_order(row, dur)
+    out = []
+    for day in days:
+        free = -1
+        for item in group: free &= avail_masks.get((item.Lecturer, sem, day), 0)
+        for h in hours:
+            if not (((1 << dur) - 1) << h) & ~free: out.append((day, h))
+    return out
+
+
+def empty_domain_reason(row, group, avail_masks, dur, sem):
+    days, hours = candidate_order(row, dur)
+    fixed = row.FixDay is not None or row.FixHour is not None
+    if not hours:
+        return f"No Time Slot Found [Fixed Hour {int(row.FixHour)} + {dur}h Ends After {LAST_HOUR}]" if row.FixHour is not None \
+            else f"No Time Slot Found [Duration {dur}h Longer Than Day]"
+    for item in group:
+        if not any(avail_masks.get((item.Lecturer, sem, d), 0) for d in DAYS):
+            return f"No Time Slot Found [No Availability In Semester {sem}: {item.Lecturer}]"
+        if not unit_domain(row, [item], avail_masks, dur, sem):
+            if fixed: return f"No Time Slot Found [Fixed Day/Hour Outside Availability: {item.Lecturer}]"
+            return f"No Time Slot Found [No Free {dur}h Block: {item.Lecturer}]"
+    return "No Time Slot Found [Linked Lecturers Have No Common Slot]"
+
+
+def analyze_feasibility(instance, avail_masks):
+    """Domains and infeasibility reasons for every unit of a SchedulingInstance."""
+    feas = Feasibility()
+    seen = set()
+    for row in instance.hard + instance.soft:
+        lid = row.LinkID
+        if lid and lid in seen: continue
+        group = [row]
+        if lid:
+            group = instance.links.get(lid, [])
+            seen.add(lid)
+        feas.groups[row.Row] = group
+        try:
+            dur = int(row.Duration)
+            sem = int(row.Semester)
+            if dur < 0: raise ValueError(dur)
+            dom = unit_domain(row, group, avail_masks, dur, sem)
+        except (TypeError, ValueError): feas.reasons[row.Row] = "Invalid Data"; continue
+        feas.domains[row.Row] = dom
+        if not dom and group: feas.reasons[row.Row] = empty_domain_reason(row, group, avail_masks, dur, sem)
+        elif instance.rooms is not None:
+            why = instance.rooms.why_unroomable(group)
+            if why: feas.reasons[row.Row] = why
+    return feas
@@ -1,6 +1,8 @@
 import streamlit as st
 import google.generativeai as genai
 
+from chat_client import ChatClient
+
 # --- 1. הגדרת המפתח ---
 try:
     GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
@@ -8,7 +10,8 @@ except:
     # בריצה מקומית כרגע זה לא יעבוד בגלל החסימה, אבל זה שומר מקום למפתח
     GOOGLE_API_KEY = "PLACEHOLDER" 
 
-genai.configure(api_key=GOOGLE_API_KEY)
+chat_client = ChatClient(genai)
+chat_client.configure(GOOGLE_API_KEY)
 
 # --- 2. הגדרת ההנחיות (במשתנים נפרדים למניעת שגיאות סינטקס) ---
 
@@ -122,8 +125,9 @@ if prompt := st.chat_input("כתוב כאן..."):
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
         try:
-            response = st.session_state.chat_session.send_message(prompt)
-            message_placeholder.markdown(response.text)
-            st.session_state.messages.append({"role": "model", "content": response.text})
+            text = chat_client.stream_reply(st.session_state.chat_session, prompt,
+                                            on_text=lambda t: message_placeholder.markdown(t + "▌"))
+            message_placeholder.markdown(text)
+            st.session_state.messages.append({"role": "model", "content": text})
         except Exception as e:
             st.error(f"שגיאה: {e}")
\ No newline at end of file
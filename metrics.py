@@ -0,0 +1,67 @@
+"""Optional pipeline instrumentation: stage timings, counters, per-restart stats and error events.
+
+Pass a Metrics() as metrics= to solve/run_solver/run_restarts/preprocess_availability
+and read to_dict()/to_json() afterwards. The default NULL_METRICS turns every hook
+into a no-op, and the Scheduler only swaps in its counting check_valid when metrics
+are enabled, so an uninstrumented run pays nothing on the hot path.
+"""
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+MAX_EVENTS = 200
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self):
+        self.stages = {}     # stage name -> seconds (summed over repeats)
+        self.counters = {}
+        self.restarts = []   # one dict per scheduling restart
+        self.events = []     # swallowed errors etc., capped at MAX_EVENTS
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try: yield self
+        finally: self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, counters):
+        for name, n in counters.items(): self.count(name, n)
+
+    def add_restart(self, stats):
+        self.restarts.append(stats)
+
+    def event(self, kind, **fields):
+        self.count(kind)
+        if len(self.events) < MAX_EVENTS: self.events.append({'kind': kind, **fields})
+
+    def to_dict(self):
+        return {'stages': {k: round(v, 6) for k, v in self.stages.items()},
+                'counters': dict(sorted(self.counters.items())),
+                'restarts': list(self.restarts), 'events': list(self.events)}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), ensure_ascii=False, default=str, **kwargs)
+
+
+class NullMetrics(Metrics):
+    """Disabled metrics: same interface, records nothing."""
+    enabled = False
+
+    def stage(self, name): return nullcontext(self)
+
+    def count(self, name, n=1): pass
+
+    def merge(self, counters): pass
+
+    def add_restart(self, stats): pass
+
+    def event(self, kind, **fields): pass
+
+
+NULL_METRICS = NullMetrics()
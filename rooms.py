@@ -0,0 +1,132 @@
+"""Room inventory and indexed room allocation.
+
+ROOMS file columns: חדר (room name), קיבולת (capacity), סוג (room type). A course's
+Space (מרחב) selects its rooms: "zoom" needs no room, a room name pins that room, a
+room type allows every room of that type and an empty Space allows any room; the
+optional משתתפים (Students) column of COURSES filters by capacity.
+
+Rooms get bit positions in ascending capacity order. Each course record gets an
+eligibility bitmask once per instance, and a run keeps (sem, day, hour) -> bitmask
+of booked rooms, so finding the tightest free room for a slot is a few integer
+operations per hour instead of a scan over the rooms.
+"""
+from bisect import bisect_left
+
+import pandas as pd
+
+ROOM_COLUMNS = {'חדר': 'Room', 'קיבולת': 'Capacity', 'סוג': 'Type'}
+NO_ROOM = -1
+
+
+def _key(val):
+    return " ".join(str(val).split()).lower() if val is not None and not pd.isna(val) else ""
+
+
+def preprocess_rooms(df):
+    """Raw ROOMS frame -> Room / Capacity / Type. Raises ValueError without a room column."""
+    df = df.dropna(how='all')
+    df = df.rename(columns={col: ROOM_COLUMNS[str(col).strip()] for col in df.columns if str(col).strip() in ROOM_COLUMNS})
+    if 'Room' not in df.columns: raise ValueError("No 'Room' (חדר) column found in rooms file.")
+    df = df[df['Room'].notna()].copy()
+    df['Room'] = df['Room'].astype(str).str.strip()
+    df['Capacity'] = pd.to_numeric(df['Capacity'], errors='coerce') if 'Capacity' in df.columns else float('nan')
+    if 'Type' not in df.columns: df['Type'] = None
+    return df[['Room', 'Capacity', 'Type']].drop_duplicates('Room').reset_index(drop=True)
+
+
+class RoomInventory:
+    """Static room data; rooms without a capacity count as unlimited."""
+
+    def __init__(self, rooms):
+        rooms = rooms.assign(_cap=rooms['Capacity'].fillna(float('inf'))).sort_values(['_cap', 'Room'], kind='stable')
+        self.names = rooms['Room'].tolist()
+        self.capacity = rooms['_cap'].tolist()
+        self.all = (1 << len(self.names)) - 1
+        self.by_name = {_key(n): 1 << i for i, n in enumerate(self.names)}
+        self.by_type = {}
+        for i, t in enumerate(rooms['Type']):
+            if _key(t): self.by_type[_key(t)] = self.by_type.get(_key(t), 0) | 1 << i
+
+    def eligible(self, record):
+        """Bitmask of rooms the course may use, or None when it needs no room (Zoom)."""
+        space = _key(record.Space)
+        if space == 'zoom': return None
+        mask = self.all if not space else self.by_name.get(space, self.by_type.get(space, 0))
+        students = getattr(record, 'Students', None)
+        if students is not None and not pd.isna(students):
+            # החדרים ממוינים לפי קיבולת - כל החדרים מהאינדקס הראשון שמספיק והלאה
+            mask &= self.all & ~((1 << bisect_left(self.capacity, float(students))) - 1)
+        return mask
+
+    def bind(self, records):
+        return RoomPlan(self, {r.Row: self.eligible(r) for r in records})
+
+
+class RoomPlan:
+    """Room eligibility of one SchedulingInstance plus allocation against a run's booking index."""
+
+    def __init__(self, inventory, eligible):
+        self.inventory = inventory
+        self.names = inventory.names
+        self.eligible = eligible
+
+    def assign(self, group, busy, sem, day, start_h, dur):
+        """Room per group item (NO_ROOM for Zoom); None if the items cannot all get distinct free rooms.
+
+        Items are matched most-constrained first, each to its tightest free room, with
+        augmenting paths (bipartite matching) when a room it needs is already taken, so a
+        linked group fails only when no assignment exists.
+        """
+        used = 0
+        for h in range(start_h, start_h + dur): used |= busy.get((sem, day, h), 0)
+        free = {}
+        for i, item in enumerate(group):
+            elig = self.eligible[item.Row]
+            if elig is None: continue
+            free[i] = elig & ~used
+            if not free[i]: return None
+        owner = {}   # room -> group position
+
+        def augment(i, seen):
+            m = free[i] & ~seen[0]
+            while m:
+                bit = m & -m
+                m ^= bit
+                seen[0] |= bit
+                r = bit.bit_length() - 1
+                if r not in owner or augment(owner[r], seen):
+                    owner[r] = i
+                    return True
+            return False
+        for i in sorted(free, key=lambda i: bin(free[i]).count('1')):
+            if not augment(i, [0]): return None
+        out = [NO_ROOM] * len(group)
+        for r, i in owner.items(): out[i] = r
+        return out
+
+    def book(self, busy, sem, day, start_h, dur, rooms, on=True):
+        mask = 0
+        for r in rooms:
+            if r != NO_ROOM: mask |= 1 << r
+        if not mask: return
+        for h in range(start_h, start_h + dur):
+            key = (sem, day, h)
+            busy[key] = busy.get(key, 0) | mask if on else busy.get(key, 0) & ~mask
+
+    def why_unroomable(self, group):
+        """Failure reason when the group can never get rooms, else None."""
+        needed, union = 0, 0
+        for item in group:
+            elig = self.eligible[item.Row]
+            if elig is None: continue
+            if not elig:
+                space = _key(item.Space)
+                if space and space not in self.inventory.by_name and space not in self.inventory.by_type:
+                    return f"No Room Available [Unknown Space: {item.Space}]"
+                students = getattr(item, 'Students', None)
+                if students is None or pd.isna(students): return f"No Room Available [No {item.Space or 'Room'}]"
+                return f"No Room Available [No {item.Space or 'Room'} For {int(students)} Students: {item.Course}]"
+            needed += 1
+            union |= elig
+        if needed > bin(union).count('1'): return "No Room Available [Not Enough Rooms For Linked Courses]"
+        return None
@@ -0,0 +1,261 @@
+"""What-if scenarios over a solved timetable.
+
+    base = Baseline.solve(courses, avail_db, sparsity, seed=1)
+    results = base.evaluate_many([
+        Scenario("X drops Tuesday").drop_day("X", 3),
+        Scenario("Y to semester B").move_semester("Y", 2),
+    ], workers=4)
+
+A Baseline keeps the solved state (lecturer/year hour masks, room bookings,
+availability masks, placements) read-only. A scenario works on copy-on-write
+overlays of those maps that only store the keys it changes, unplaces just the
+units its edits invalidate, re-places them - and retries the baseline's failures -
+greedily around the unchanged rest, and returns a diff against the baseline.
+Since the baseline is never written, scenarios can run concurrently in threads or,
+through evaluate_many, in a process pool that receives the baseline once per worker.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from engine import (CompactSchedule, CourseRecord, Scheduler, build_avail_masks, normalize_name, run_restarts_compact,
+                    schedule_diff)
+from feasibility import empty_domain_reason, unit_domain
+from rooms import NO_ROOM
+
+
+class CowDict:
+    """Read-through overlay of a dict: writes go to a private delta, the base is never modified."""
+    __slots__ = ('base', 'delta')
+
+    def __init__(self, base):
+        self.base = base
+        self.delta = {}
+
+    def get(self, key, default=None):
+        return self.delta[key] if key in self.delta else self.base.get(key, default)
+
+    def __getitem__(self, key):
+        return self.delta[key] if key in self.delta else self.base[key]
+
+    def __setitem__(self, key, value):
+        self.delta[key] = value
+
+    def __contains__(self, key):
+        return key in self.delta or key in self.base
+
+
+class _RecordView:
+    """instance.records with edited copies laid over some rows."""
+    __slots__ = ('base', 'edited')
+
+    def __init__(self, base):
+        self.base = base
+        self.edited = {}
+
+    def __getitem__(self, row):
+        rec = self.edited.get(row)
+        return rec if rec is not None else self.base[row]
+
+
+def _edited(rec, **changes):
+    out = CourseRecord(**{k: getattr(rec, k) for k in CourseRecord.__slots__})
+    for k, v in changes.items(): setattr(out, k, v)
+    return out
+
+
+class Scenario:
+    """Named list of edits; every builder method returns self so edits can be chained."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self.edits = []
+
+    def drop_day(self, lecturer, day, semester=None):
+        """The lecturer is no longer available on day (in semester, or in every semester)."""
+        self.edits.append(('drop_day', normalize_name(lecturer), int(day), None if semester is None else int(semester)))
+        return self
+
+    def set_availability(self, lecturer, semester, day, hours):
+        """Replaces the lecturer's available hours on (semester, day), e.g. hours=range(10, 14)."""
+        self.edits.append(('set_availability', normalize_name(lecturer), int(semester), int(day), tuple(hours)))
+        return self
+
+    def move_semester(self, course, semester, lecturer=None):
+        """Moves a course (with its LinkID group) to another semester."""
+        self.edits.append(('move_semester', course, lecturer, int(semester))); return self
+
+    def fix_slot(self, course, day=None, hour=None, lecturer=None):
+        """Pins a course (with its LinkID group) to a day and/or start hour; None leaves that part free."""
+        self.edits.append(('fix_slot', course, lecturer, (day, hour))); return self
+
+    def remove_course(self, course, lecturer=None):
+        self.edits.append(('remove_course', course, lecturer, None)); return self
+
+
+class ScenarioResult:
+    __slots__ = ('name', 'schedule', 'errors', 'changes', 'summary')
+
+    def __init__(self, name, schedule, errors, changes, summary):
+        self.name = name
+        self.schedule = schedule
+        self.errors = errors
+        self.changes = changes
+        self.summary = summary
+
+
+class Baseline:
+    """A solved greedy timetable that scenarios fork from without copying it."""
+
+    def __init__(self, instance, avail_masks, compact):
+        self.instance = instance
+        self.avail_masks = avail_masks
+        self.compact = compact
+        feas = instance.feasibility
+        self.unit_of = {item.Row: main for main, group in feas.groups.items() for item in group}
+        hard = {r.Row for r in instance.hard}
+        rank = {r.Row: i for i, r in enumerate(instance.hard + instance.soft_sorted)}
+        self.order = {main: (main not in hard, rank[main]) for main in feas.groups}
+        self.units_of_lecturer, self.rows_of_course = {}, {}
+        for main, group in feas.groups.items():
+            for item in group:
+                self.units_of_lecturer.setdefault(item.Lecturer, set()).add(main)
+                self.rows_of_course.setdefault(normalize_name(item.Course), []).append(item.Row)
+
+        # מפות התפוסה של הפתרון - נבנות פעם אחת ולא נכתבות יותר
+        self.lec_busy, self.busy, self.room_busy = {}, {}, {}
+        self.placed, self.room_of = {}, {}
+        for i, row in enumerate(compact.row):
+            rec = instance.records[row]
+            sem, day, start_h, dur = compact.sem[i], compact.day[i], compact.start[i], compact.dur[i]
+            span = ((1 << dur) - 1) << start_h
+            key = (rec.Lecturer, sem, day)
+            self.lec_busy[key] = self.lec_busy.get(key, 0) | span
+            if rec.Year:
+                key = (rec.Year, sem, day)
+                self.busy[key] = self.busy.get(key, 0) | span
+            self.room_of[row] = compact.room[i]
+            if compact.room[i] != NO_ROOM: instance.rooms.book(self.room_busy, sem, day, start_h, dur, [compact.room[i]])
+            self.placed.setdefault(self.unit_of[row], (sem, day, start_h, dur))
+        self.failed = {self.unit_of[row] for row in compact.err_row}
+        self.schedule, self.errors = compact.to_frames(instance.records, instance.rooms)
+
+    @classmethod
+    def solve(cls, courses, avail_db, sparsity, **kwargs):
+        """Solves with run_restarts_compact (same keyword arguments) and wraps the result."""
+        instance, compact = run_restarts_compact(courses, avail_db, sparsity, **kwargs)
+        return cls(instance, build_avail_masks(avail_db), compact)
+
+    def _rows(self, course, lecturer):
+        rows = self.rows_of_course.get(normalize_name(course), [])
+        if lecturer is not None: rows = [r for r in rows if self.instance.records[r].Lecturer == normalize_name(lecturer)]
+        if not rows: raise ValueError(f"Course not found: {course}")
+        return rows
+
+    def evaluate(self, scenario, retry_failed=True):
+        """Applies the scenario's edits to a fork of the baseline, re-solves the affected units
+        and returns a ScenarioResult (schedule, errors, changes vs. the baseline, summary)."""
+        inst, feas = self.instance, self.instance.feasibility
+        masks = CowDict(self.avail_masks)
+        records = _RecordView(inst.records)
+        touched, removed, lecturers = set(), set(), set()
+        for kind, *args in scenario.edits:
+            if kind == 'drop_day':
+                lecturer, day, sem = args
+                sems = [sem] if sem is not None else sorted({k[1] for k in self.avail_masks if k[0] == lecturer})
+                for s in sems: masks[(lecturer, s, day)] = 0
+                lecturers.add(lecturer)
+            elif kind == 'set_availability':
+                lecturer, sem, day, hours = args
+                masks[(lecturer, sem, day)] = sum(1 << h for h in set(hours))
+                lecturers.add(lecturer)
+            else:
+                course, lecturer, value = args
+                rows = self._rows(course, lecturer)
+                if kind == 'remove_course': removed.update(rows)
+                for main in {self.unit_of[r] for r in rows}:
+                    touched.add(main)
+                    if kind == 'remove_course': continue
+                    changes = {'Semester': value} if kind == 'move_semester' else \
+                        {'FixDay': value[0], 'FixHour': value[1]}
+                    for item in feas.groups[main]: records.edited[item.Row] = _edited(records[item.Row], **changes)
+
+        # יחידות שהשיבוץ שלהן כבר לא בתוך הזמינות החדשה - ויחידות שנכשלו אצל אותם מרצים
+        for lecturer in lecturers:
+            for main in self.units_of_lecturer.get(lecturer, ()):
+                if main in self.failed: touched.add(main); continue
+                if main not in self.placed: continue
+                sem, day, start_h, dur = self.placed[main]
+                span = ((1 << dur) - 1) << start_h
+                if any(span & ~masks.get((it.Lecturer, sem, day), 0) for it in feas.groups[main]): touched.add(main)
+        todo = touched | (self.failed if retry_failed else set())
+
+        sched = Scheduler(None, None, None, masks, inst)
+        sched.lec_busy, sched.busy, sched.room_busy = CowDict(self.lec_busy), CowDict(self.busy), CowDict(self.room_busy)
+        for main in todo:
+            if main not in self.placed: continue
+            sem, day, start_h, dur = self.placed[main]
+            span = ((1 << dur) - 1) << start_h
+            group = feas.groups[main]
+            for it in group:
+                key = (it.Lecturer, sem, day)
+                sched.lec_busy[key] = sched.lec_busy.get(key, 0) & ~span
+                if it.Year:
+                    key = (it.Year, sem, day)
+                    sched.busy[key] = sched.busy.get(key, 0) & ~span
+            if inst.rooms is not None:
+                inst.rooms.book(sched.room_busy, sem, day, start_h, dur, [self.room_of[it.Row] for it in group], on=False)
+
+        for main in sorted(todo, key=self.order.get):
+            group = [records[it.Row] for it in feas.groups[main] if it.Row not in removed]
+            if not group: continue
+            head = group[0]
+            try:
+                dur, sem = int(head.Duration), int(head.Semester)
+                if dur < 0: raise ValueError(dur)
+                domain = unit_domain(head, group, masks, dur, sem)
+            except (TypeError, ValueError): sched.fail(group, "Invalid Data"); continue
+            why = empty_domain_reason(head, group, masks, dur, sem) if not domain else \
+                inst.rooms.why_unroomable(group) if inst.rooms is not None else None
+            if why: sched.fail(group, why)
+            else: sched.place(head, group, domain)
+
+        redo = {it.Row for main in todo for it in feas.groups[main]}
+        out, base, new = CompactSchedule(), self.compact, sched.result
+        for src, skip in ((base, redo), (new, ())):
+            for i, row in enumerate(src.row):
+                if row not in skip: out.add(row, src.sem[i], src.day[i], src.start[i], src.dur[i], src.room[i])
+        for src, skip in ((base, redo), (new, ())):
+            for row, reason in zip(src.err_row, src.err_reason):
+                if row not in skip: out.fail(row, reason)
+        schedule, errors = out.to_frames(records, inst.rooms)
+        changes = schedule_diff(self.schedule, schedule)
+        counts = changes['Change'].value_counts()
+        summary = {'resolved_units': len(todo), 'moved': int(counts.get('moved', 0)),
+                   'added': int(counts.get('added', 0)), 'removed': int(counts.get('removed', 0)),
+                   'failed': out.n_errors, 'failed_delta': out.n_errors - self.compact.n_errors}
+        return ScenarioResult(scenario.name, schedule, errors, changes, summary)
+
+    def evaluate_many(self, scenarios, workers=1, retry_failed=True):
+        """Evaluates scenarios independently; with workers > 1 over a process pool."""
+        if workers <= 1: return [self.evaluate(s, retry_failed) for s in scenarios]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_scenario_worker,
+                                 initargs=(self, retry_failed)) as pool:
+            return list(pool.map(_run_scenario, scenarios))
+
+    def summary_table(self, results):
+        """One row per ScenarioResult with its summary counts."""
+        return pd.DataFrame([{'Scenario': r.name, **r.summary} for r in results])
+
+
+_BASELINE = None
+
+
+def _init_scenario_worker(baseline, retry_failed):
+    global _BASELINE
+    _BASELINE = (baseline, retry_failed)
+
+
+def _run_scenario(scenario):
+    baseline, retry_failed = _BASELINE
+    return baseline.evaluate(scenario, retry_failed)
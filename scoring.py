@@ -0,0 +1,211 @@
+"""Soft-constraint quality score of a timetable and a local-search improvement phase.
+
+The score is a weighted sum of
+  year_gaps      idle hours between the first and last class of a student year's day
+  lecturer_days  (lecturer, semester, day) combinations with any teaching, i.e. days on campus
+  late_hours     course hours from LATE_HOUR on, for anything that is not on Zoom
+  load_balance   sum of squared daily hours per student year (lowest when spread evenly)
+Lower is better. Every term depends on a single (year|lecturer, sem, day) hour bitmask
+or on a single placement, so a move is re-scored by updating only the masks it touches.
+"""
+import random
+import time
+
+DEFAULT_WEIGHTS = {'year_gaps': 3.0, 'lecturer_days': 2.0, 'late_hours': 1.0, 'load_balance': 0.2}
+LATE_HOUR = 18
+PARTS = list(DEFAULT_WEIGHTS)
+
+
+def gap_hours(mask):
+    """Unset hours between the lowest and highest set hour of a bitmask."""
+    if not mask: return 0
+    low = (mask & -mask).bit_length() - 1
+    return mask.bit_length() - low - bin(mask).count('1')
+
+
+def late_hours(start_h, dur):
+    return max(0, start_h + dur - max(start_h, LATE_HOUR))
+
+
+def _is_zoom(space):
+    return str(space).lower() == 'zoom'
+
+
+class _Placed:
+    """A committed unit (single row or LinkID group) and the CompactSchedule positions it fills."""
+    __slots__ = ('items', 'sem', 'dur', 'day', 'start', 'domain', 'late_items', 'pos', 'rooms')
+
+    def __init__(self, items, sem, dur, day, start, domain, pos, rooms):
+        self.items = items
+        self.sem = sem
+        self.dur = dur
+        self.day = day
+        self.start = start
+        self.domain = domain
+        self.late_items = sum(1 for it in items if not _is_zoom(it.Space))
+        self.pos = pos
+        self.rooms = rooms
+
+
+class ScoreState:
+    """Occupancy masks and score parts of one CompactSchedule, kept current under moves.
+
+    When the instance has rooms, moved units are re-allocated rooms from the same
+    (sem, day, hour) booking index the Scheduler uses.
+    """
+
+    def __init__(self, instance, compact, weights=None):
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.compact = compact
+        self.year, self.lec = {}, {}   # (year|lecturer, sem, day) -> bitmask, as in Scheduler
+        self.parts = dict.fromkeys(PARTS, 0)
+        self.plan = instance.rooms
+        self.room_busy = {}
+        self._assigned = None
+        feas = instance.feasibility
+        pos = {}
+        for i, row in enumerate(compact.row): pos.setdefault(row, []).append(i)
+        self.units = []
+        for main, group in feas.groups.items():
+            if not group or any(it.Row not in pos for it in group): continue
+            i = pos[group[0].Row][0]
+            at = [p for it in group for p in pos[it.Row]]
+            self.units.append(_Placed(group, compact.sem[i], compact.dur[i], compact.day[i], compact.start[i],
+                                      feas.domains.get(main, []), at, [compact.room[p] for p in at]))
+        for u in self.units: self._set(u, True)
+
+    # --- incremental bookkeeping ---
+
+    def _year_mask(self, key, span, on):
+        old = self.year.get(key, 0)
+        new = old | span if on else old & ~span
+        if new == old: return
+        n_old, n_new = bin(old).count('1'), bin(new).count('1')
+        self.parts['year_gaps'] += gap_hours(new) - gap_hours(old)
+        self.parts['load_balance'] += n_new * n_new - n_old * n_old
+        self.year[key] = new
+
+    def _lec_mask(self, key, span, on):
+        old = self.lec.get(key, 0)
+        new = old | span if on else old & ~span
+        self.parts['lecturer_days'] += bool(new) - bool(old)
+        self.lec[key] = new
+
+    def _set(self, u, on):
+        span = ((1 << u.dur) - 1) << u.start
+        for it in u.items:
+            self._lec_mask((it.Lecturer, u.sem, u.day), span, on)
+            if it.Year: self._year_mask((it.Year, u.sem, u.day), span, on)
+        late = u.late_items * late_hours(u.start, u.dur)
+        self.parts['late_hours'] += late if on else -late
+        if self.plan is not None: self.plan.book(self.room_busy, u.sem, u.day, u.start, u.dur, u.rooms, on)
+
+    def _fits(self, u, day, start_h):
+        span = ((1 << u.dur) - 1) << start_h
+        for it in u.items:
+            if self.lec.get((it.Lecturer, u.sem, day), 0) & span: return False
+            if it.Year and self.year.get((it.Year, u.sem, day), 0) & span: return False
+        if self.plan is not None:
+            self._assigned = self.plan.assign(u.items, self.room_busy, u.sem, day, start_h, u.dur)
+            return self._assigned is not None
+        return True
+
+    def _place(self, u, day, start_h, rooms):
+        u.day, u.start = day, start_h
+        if rooms is not None: u.rooms = rooms
+        self._set(u, True)
+
+    def total(self):
+        return sum(self.weights[k] * v for k, v in self.parts.items())
+
+    def breakdown(self):
+        return {**self.parts, 'score': round(self.total(), 4)}
+
+    # --- neighbourhoods ---
+
+    def best_move(self, u):
+        """Moves u to the best free slot of its domain; True if the score dropped."""
+        before = self.total()
+        best = (before, u.day, u.start, u.rooms)
+        self._set(u, False)
+        old = (u.day, u.start)
+        for day, start_h in u.domain:
+            if (day, start_h) == old or not self._fits(u, day, start_h): continue
+            self._place(u, day, start_h, self._assigned)
+            cost = self.total()
+            self._set(u, False)
+            if cost < best[0] - 1e-9: best = (cost, day, start_h, u.rooms)
+        self._place(u, *best[1:])
+        return best[0] < before - 1e-9
+
+    def try_swap(self, u, v):
+        """Exchanges the slots of two units of the same semester and length if that lowers the score."""
+        a, b = (u.day, u.start), (v.day, v.start)
+        if u is v or a == b or u.sem != v.sem or u.dur != v.dur: return False
+        if b not in u.domain or a not in v.domain: return False
+        before = self.total()
+        rooms_u, rooms_v = u.rooms, v.rooms
+        self._set(u, False); self._set(v, False)
+        if self._fits(u, *b):
+            self._place(u, *b, self._assigned)
+            if self._fits(v, *a):
+                self._place(v, *a, self._assigned)
+                if self.total() < before - 1e-9: return True
+                self._set(v, False)
+            self._set(u, False)
+        self._place(u, *a, rooms_u)
+        self._place(v, *b, rooms_v)
+        return False
+
+    def write_back(self):
+        for u in self.units:
+            for p, room in zip(u.pos, u.rooms):
+                self.compact.day[p] = u.day
+                self.compact.start[p] = u.start
+                self.compact.room[p] = room
+
+
+def improve(instance, compact, weights=None, time_limit=2.0, max_steps=20000, seed=None):
+    """Local search (best single move / pairwise swap) over the committed placements of compact.
+
+    Only slots in each unit's feasibility domain that are free for all of its lecturers
+    and student years are used, so hard constraints keep holding. Stops at the time
+    limit, after max_steps, or when a full round of random picks finds no improvement;
+    the last two make the result reproducible for a fixed seed.
+    Returns (improved copy of compact, ScoreState).
+    """
+    state = ScoreState(instance, compact.copy(), weights)
+    rng = random.Random(seed)
+    movable = [u for u in state.units if len(u.domain) > 1]
+    shapes = {}
+    for u in movable: shapes.setdefault((u.sem, u.dur), []).append(u)
+    deadline = time.monotonic() + time_limit if time_limit else None
+    stale = 0
+    for _ in range(max_steps):
+        if not movable or stale > 2 * len(movable) or (deadline and time.monotonic() > deadline): break
+        u = rng.choice(movable)
+        if rng.random() < 0.5: improved = state.best_move(u)
+        else: improved = state.try_swap(u, rng.choice(shapes[(u.sem, u.dur)]))
+        stale = 0 if improved else stale + 1
+    state.write_back()
+    return state.compact, state
+
+
+def score_schedule(schedule, weights=None):
+    """Score parts and total of an hourly schedule frame (any solver's output)."""
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}
+    parts = dict.fromkeys(PARTS, 0)
+    if schedule is not None and not schedule.empty:
+        year, lec = {}, {}
+        for y, l, sem, day, h, space in zip(schedule['Year'], schedule['Lecturer'], schedule['Semester'],
+                                            schedule['Day'], schedule['Hour'], schedule['Space']):
+            bit = 1 << int(h)
+            lec[(l, sem, day)] = lec.get((l, sem, day), 0) | bit
+            if y and y == y: year[(y, sem, day)] = year.get((y, sem, day), 0) | bit
+            if int(h) >= LATE_HOUR and not _is_zoom(space): parts['late_hours'] += 1
+        parts['lecturer_days'] = len(lec)
+        for mask in year.values():
+            n = bin(mask).count('1')
+            parts['year_gaps'] += gap_hours(mask)
+            parts['load_balance'] += n * n
+    return {**parts, 'score': round(sum(w[k] * v for k, v in parts.items()), 4)}
@@ -0,0 +1,275 @@
+"""Constraint-propagation solver: MRV + least-constraining-value with forward checking,
+followed by bounded local repair. Works on the same inputs as engine.Scheduler."""
+import time
+
+import pandas as pd
+
+from engine import SchedulingInstance, build_avail_masks, normalize_name
+
+class _Unit:
+    """One placement decision: a single course row or a whole LinkID group."""
+    __slots__ = ('items', 'dur', 'sem', 'wave', 'fix_day', 'domain', 'resources', 'values', 'reason')
+
+    def __init__(self, items, dur, sem, wave, fix_day):
+        self.items = items
+        self.dur = dur
+        self.sem = sem
+        self.wave = wave
+        self.fix_day = fix_day
+        self.domain = []     # static (day, start_h) candidates, in greedy order
+        self.resources = set()
+        self.values = []     # domain filtered by current occupancy
+        self.reason = None
+
+
+def build_units(courses, instance=None, avail_masks=None):
+    """Splits courses into hard-wave units (LinkID/FixDay/FixHour) and soft-wave units.
+
+    Mirrors Scheduler.run: a LinkID group is one unit whose main row is the first
+    row of that group. Domains and failure reasons come from the instance's
+    feasibility analysis, so units that can never be placed are not searched.
+    Returns (units, infeasible) where infeasible is a list of (group, reason).
+    """
+    inst = instance if instance is not None else SchedulingInstance(courses, {}, avail_masks or {})
+    feas = inst.feasibility
+    hard = {row.Row for row in inst.hard}
+    units, infeasible = [], []
+    for main, group in feas.groups.items():
+        if main in feas.reasons: infeasible.append((group, feas.reasons[main])); continue
+        row = inst.records[main]
+        fix_day = int(row.FixDay) if row.FixDay is not None else None
+        sem = int(row.Semester)
+        u = _Unit(group, int(row.Duration), sem, 0 if main in hard else 1, fix_day)
+        u.domain = list(feas.domains[main])
+        for item in group:
+            u.resources.add(('L', item.Lecturer, sem))
+            if item.Year: u.resources.add(('Y', item.Year, sem))
+        units.append(u)
+    return units, infeasible
+
+
+def placements_from_schedule(schedule):
+    """(Course, Lecturer) -> set of (semester, day, hour) it teaches in an hourly schedule (rows in any order)."""
+    out = {}
+    if schedule is None or schedule.empty: return out
+    for c, l, sem, day, h in zip(schedule['Course'], schedule['Lecturer'], schedule['Semester'], schedule['Day'],
+                                 schedule['Hour']):
+        out.setdefault((c, normalize_name(l)), set()).add((int(sem), int(day), int(h)))
+    return out
+
+
+class CSPSolver:
+    """MRV construction with forward checking, then bounded local repair of failed units."""
+
+    def __init__(self, courses, avail_db, sparsity, avail_masks=None, time_limit=10.0, max_repairs=20000):
+        self.courses = courses
+        self.avail_db = avail_db
+        self.sparsity = sparsity
+        self.avail_masks = avail_masks if avail_masks is not None else build_avail_masks(avail_db)
+        self.time_limit = time_limit
+        self.max_repairs = max_repairs
+        self.lec_busy = {}   # (lecturer, sem, day) -> bitmask of busy hours
+        self.busy = {}       # (year, sem, day) -> bitmask of busy hours
+        self.placed = {}     # id(unit) -> (day, start_h)
+        self.evaluations = 0
+        self.repairs = 0
+        self.kept = 0        # units left in their previous placement (incremental runs)
+
+    # --- occupancy ---
+
+    def _fits(self, u, day, start_h):
+        span = ((1 << u.dur) - 1) << start_h
+        for item in u.items:
+            if self.lec_busy.get((item.Lecturer, u.sem, day), 0) & span: return False
+            year = item.Year
+            if year and self.busy.get((year, u.sem, day), 0) & span: return False
+        return True
+
+    def _set(self, u, v, on):
+        day, start_h = v
+        span = ((1 << u.dur) - 1) << start_h
+        for item in u.items:
+            keys = [(self.lec_busy, (item.Lecturer, u.sem, day))]
+            if item.Year: keys.append((self.busy, (item.Year, u.sem, day)))
+            for grid, key in keys:
+                grid[key] = grid.get(key, 0) | span if on else grid.get(key, 0) & ~span
+        if on: self.placed[id(u)] = v
+        else: del self.placed[id(u)]
+
+    def _refresh(self, u):
+        u.values = [v for v in u.domain if self._fits(u, *v)]
+
+    def _neighbours(self, u, pool):
+        seen = set()
+        for r in u.resources:
+            for n in self.by_resource[r]:
+                if n is not u and id(n) in pool and id(n) not in seen:
+                    seen.add(id(n))
+                    yield n
+
+    # --- construction ---
+
+    def _order(self, u, open_units):
+        """Least-constraining value first: summed hourly demand of unplaced neighbours."""
+        demand = {}
+        for n in self._neighbours(u, open_units):
+            for day, h0 in n.values:
+                for h in range(h0, h0 + n.dur):
+                    demand[(day, h)] = demand.get((day, h), 0) + 1
+        if not demand: return list(u.values)
+        return sorted(u.values, key=lambda v: sum(demand.get((v[0], h), 0) for h in range(v[1], v[1] + u.dur)))
+
+    def _place_best(self, u, open_units):
+        """Forward checking: takes the first value (in LCV order) that leaves every open
+        neighbour a value, else the one that empties the fewest neighbour items."""
+        best = None
+        for v in self._order(u, open_units):
+            self.evaluations += 1
+            self._set(u, v, True)
+            wiped = 0
+            for n in self._neighbours(u, open_units):
+                if n.values and not any(self._fits(n, *w) for w in n.values): wiped += len(n.items)
+            self._set(u, v, False)
+            if best is None or wiped < best[0]: best = (wiped, v)
+            if not wiped: break
+        self._set(u, best[1], True)
+        for n in self._neighbours(u, open_units): self._refresh(n)
+
+    # --- repair ---
+
+    def _blockers(self, u, v):
+        day, start_h = v
+        end = start_h + u.dur
+        out = []
+        for n in self._neighbours(u, self.placed):
+            d, h0 = self.placed[id(n)]
+            if d == day and h0 < end and start_h < h0 + n.dur: out.append(n)
+        return out
+
+    def _repair(self, u):
+        """Places failed unit u by moving at most two placed units elsewhere."""
+        for v in u.domain:
+            blockers = self._blockers(u, v)
+            if not blockers or len(blockers) > 2: continue
+            self.repairs += 1
+            old = [(b, self.placed[id(b)]) for b in blockers]
+            for b, w in old: self._set(b, w, False)
+            if self._fits(u, *v):
+                self._set(u, v, True)
+                moved = []
+                for b, w in old:
+                    alt = next((x for x in b.domain if x != w and self._fits(b, *x)), None)
+                    if alt is None: break
+                    self.evaluations += 1
+                    self._set(b, alt, True)
+                    moved.append(b)
+                if len(moved) == len(old): return True
+                for b in moved: self._set(b, self.placed[id(b)], False)
+                self._set(u, v, False)
+            for b, w in old: self._set(b, w, True)
+        return False
+
+    # --- search ---
+
+    def _previous_value(self, u, prev):
+        """A still-legal previous placement of the unit, matched by duration and start.
+
+        Candidates are the starts of the first item's runs of consecutive hours in the
+        unit's semester: runs of exactly u.dur hours first, then longer runs (e.g. two
+        sessions of a repeated row placed back to back) split from their start. Every
+        item must teach the whole window. The chosen hours are consumed, so the next
+        row of the same course starts where this one ended.
+        """
+        hours = [prev.get((item.Course, item.Lecturer)) for item in u.items]
+        if not all(hours): return None
+        first, starts = hours[0], []
+        for sem, day, h in first:
+            if sem != u.sem or (sem, day, h - 1) in first: continue
+            n = 1
+            while (sem, day, h + n) in first: n += 1
+            if n >= u.dur: starts.append((n != u.dur, day, h))
+        for _, day, start_h in sorted(starts):
+            window = [(u.sem, day, h) for h in range(start_h, start_h + u.dur)]
+            if not all(w in hrs for hrs in hours for w in window): continue
+            if (day, start_h) not in u.domain or not self._fits(u, day, start_h): continue
+            for hrs in hours: hrs.difference_update(window)
+            return (day, start_h)
+        return None
+
+    def run(self, previous=None, previous_errors=None):
+        """Solves from scratch, or incrementally when given a previous hourly schedule.
+
+        In incremental mode every unit whose previous placement is still legal under
+        the current courses/availability is kept fixed, and only new or invalidated
+        units are placed; repair may move kept units to make room for those. Units
+        listed in previous_errors only take free slots, so an unchanged input leaves
+        the timetable untouched. The time limit covers construction too: once it
+        passes, the remaining units are placed first-fit (or fail) and repair is skipped.
+        """
+        deadline = time.monotonic() + self.time_limit if self.time_limit else None
+        units, infeasible = build_units(self.courses, SchedulingInstance(self.courses, self.sparsity, self.avail_masks))
+        self.lec_busy, self.busy, self.placed = {}, {}, {}
+        self.evaluations = self.repairs = 0
+        self.by_resource = {}
+        for u in units:
+            u.values = list(u.domain)
+            for r in u.resources: self.by_resource.setdefault(r, []).append(u)
+
+        open_units = {id(u): u for u in units}
+        order, failed = [], []
+        self.kept = 0
+        if previous is not None:
+            prev = placements_from_schedule(previous)
+            for u in units:
+                v = self._previous_value(u, prev)
+                if v is not None:
+                    self._set(u, v, True)
+                    del open_units[id(u)]
+                    order.append(u)
+            self.kept = len(order)
+            for u in open_units.values(): self._refresh(u)
+        stuck = set()
+        if previous_errors is not None and not previous_errors.empty:
+            stuck = {(c, normalize_name(l)) for c, l in zip(previous_errors['Course'], previous_errors['Lecturer'])}
+        priority = lambda x: (x.wave, len(x.values), -x.dur * len(x.items))
+        while open_units:
+            if deadline and time.monotonic() > deadline: break
+            u = min(open_units.values(), key=priority)
+            del open_units[id(u)]
+            if u.values:
+                self._place_best(u, open_units)
+                order.append(u)
+            else: failed.append(u)
+        # הזמן נגמר באמצע הבנייה: שאר היחידות נכנסות למשבצת הפנויה הראשונה או נכשלות, בלי MRV ובלי תיקון
+        for u in sorted(open_units.values(), key=priority):
+            v = next((v for v in u.domain if self._fits(u, *v)), None)
+            if v is None: failed.append(u); continue
+            self._set(u, v, True)
+            order.append(u)
+
+        # תיקון מקומי: מנסים לשבץ כשלונות ע"י הזזת חוסמים, עד שאין שיפור או שהזמן נגמר
+        improved = True
+        while failed and improved:
+            improved = False
+            for u in list(failed):
+                if all((it.Course, it.Lecturer) in stuck for it in u.items): continue
+                if self.repairs >= self.max_repairs or (deadline and time.monotonic() > deadline): break
+                if self._repair(u):
+                    failed.remove(u); order.append(u); improved = True
+
+        schedule, errors = [], []
+        for u in order:
+            day, start_h = self.placed[id(u)]
+            for item in u.items:
+                for h in range(start_h, start_h + u.dur):
+                    schedule.append({
+                        'Year': item.Year, 'Semester': u.sem, 'Day': day, 'Hour': h,
+                        'Course': item.Course, 'Lecturer': item.Lecturer,
+                        'Space': item.Space, 'LinkID': item.LinkID
+                    })
+        for u in failed:
+            u.reason = "No Time Slot Found" + (" [Day Constraint]" if u.fix_day is not None else "")
+        for group, reason in infeasible + [(u.items, u.reason) for u in failed]:
+            for item in group:
+                errors.append({'Course': item.Course, 'Lecturer': item.Lecturer, 'Reason': reason, 'LinkID': item.LinkID})
+        return pd.DataFrame(schedule), pd.DataFrame(errors)
@@ -0,0 +1,79 @@
+"""preprocess_availability (vectorized) against the row-by-row parse_availability parser."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import parse_availability, preprocess_availability, safe_str
+
+
+def legacy_availability(df):
+    """The original iterrows + parse_availability build of (avail_db, sparsity)."""
+    df = df.dropna(how='all')
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={'שם מלא': 'Lecturer'})
+    df['Lecturer'] = df['Lecturer'].apply(safe_str)
+    df = df[df['Lecturer'].notna()]
+    avail_db, sparsity = {}, {}
+    avail_cols = [c for c in df.columns if str(c).isdigit()]
+    for _, row in df.iterrows():
+        lec = " ".join(row['Lecturer'].split())
+        avail_db.setdefault(lec, {})
+        count = 0
+        for sem, day, h in parse_availability(row, avail_cols):
+            avail_db[lec].setdefault(sem, {}).setdefault(day, set()).add(h)
+            count += 1
+        sparsity[lec] = count
+    return avail_db, sparsity
+
+
+def assert_same(df):
+    expected = legacy_availability(df.copy())
+    assert preprocess_availability(df.copy()) == expected
+
+
+@pytest.mark.parametrize('cell', [
+    "8-12", "8-10, 12-14", "8-10;12-14", "9-11 ; 13-15,16-17",   # separators
+    "10", "x, 8-10", "8-10, 12",                                 # parts without '-' are ignored
+    "8-x, 12-14", "-5, 8-10", "8-10, a-b, 12-14", "8-", "",      # a malformed range drops the rest of the cell
+    "8.5-11.9", "8.0-10.0", " 9 - 11 ", "8-10-12", "12-8", "10-10",
+    "inf-12", "8-10, inf-12", "8-10, 12-inf", "nan-12",                # non-finite hours are malformed too
+    9.0, 8,
+])
+def test_cell_formats(cell):
+    assert_same(pd.DataFrame({'שם מלא': ["מרצה א"], '11': [cell], '22': ["8-9"]}))
+
+
+def test_columns_and_duplicate_rows():
+    df = pd.DataFrame({
+        'שם מלא': ["  מרצה   א ", "מרצה ב", "מרצה א", None, "nan", "מרצה ג"],
+        '11': ["8-10", "9-12", "14-16", "8-20", "8-9", None],
+        '21': [None, "10-12;13-14", "8-10", "8-9", None, "x"],
+        '81': ["8-12", "8-12", None, None, None, None],    # day 8 is out of range
+        '01': ["8-12", None, None, None, None, None],      # day 0 is out of range
+        '1': ["8-12", None, None, None, None, None],       # needs day and semester digits
+        '352': ["10-12", None, "9-10", None, None, None],  # only the first two digits count
+        ' 42 ': ["11-13", None, None, None, None, None],   # header whitespace is stripped
+        'הערות': ["8-12", None, None, None, None, None],   # not an availability column
+    })
+    assert_same(df)
+
+
+def test_random_tables():
+    rnd = random.Random(7)
+    pieces = ["8-10", "10-12", "9.5-13", "x-1", "7", "14-18", "", " 12 - 15 ", "-3"]
+    names = [f"מרצה {i}" for i in range(25)]
+    rows = []
+    for _ in range(60):
+        row = {'שם מלא': rnd.choice(names)}
+        for day in range(1, 7):
+            for sem in (1, 2):
+                if rnd.random() < 0.5:
+                    row[f"{day}{sem}"] = rnd.choice([",", ";", ", "]).join(rnd.sample(pieces, rnd.randint(1, 3)))
+        rows.append(row)
+    assert_same(pd.DataFrame(rows))
+
+
+def test_no_availability_columns():
+    assert_same(pd.DataFrame({'שם מלא': ["מרצה א", "מרצה ב"], 'הערות': ["8-10", np.nan]}))
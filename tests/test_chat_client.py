@@ -0,0 +1,143 @@
+"""ChatClient against an injected fake genai: model probing, streamed replies, tool calls and rollback."""
+import pytest
+
+pytest.importorskip("google.generativeai")
+from google.generativeai import protos  # noqa: E402
+from google.generativeai.generative_models import ChatSession  # noqa: E402
+from google.generativeai.types import generation_types  # noqa: E402
+
+import chat_client  # noqa: E402
+from chat_client import ChatClient  # noqa: E402
+
+
+class FakeGenai:
+    """configure() and GenerativeModel(name).count_tokens(), failing for the names in down."""
+
+    def __init__(self, down=()):
+        self.down = set(down)
+        self.probes = []
+        self.configured = None
+
+    def configure(self, **kwargs): self.configured = kwargs
+
+    def GenerativeModel(self, name, **kwargs):
+        genai = self
+
+        class Model:
+            def count_tokens(self, text, request_options=None):
+                genai.probes.append(name)
+                if name in genai.down: raise ConnectionError(f"{name} unavailable")
+        return Model()
+
+
+class FakeModel:
+    """Stands in for GenerativeModel under the SDK's ChatSession; each call pops one scripted step.
+
+    A step is an exception (the request fails) or a list of chunks, where an exception
+    chunk breaks the stream at that point.
+    """
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.requests = []
+
+    def _get_tools_lib(self, tools): return None
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.requests.append([c.role for c in contents])
+        step = self.steps.pop(0)
+        if isinstance(step, Exception): raise step
+
+        def chunks():
+            for chunk in step:
+                if isinstance(chunk, Exception): raise chunk
+                yield chunk
+        if stream: return generation_types.GenerateContentResponse.from_iterator(chunks())
+        return generation_types.GenerateContentResponse.from_response(step[0])
+
+
+def reply(*parts, finish=protos.Candidate.FinishReason.STOP):
+    return protos.GenerateContentResponse(candidates=[protos.Candidate(
+        content=protos.Content(role='model', parts=list(parts)), finish_reason=finish)])
+
+
+def text(t): return reply(protos.Part(text=t))
+
+
+def call(name, **args):
+    return reply(protos.Part(function_call=protos.FunctionCall(name=name, args=args)),
+                 finish=protos.Candidate.FinishReason.FINISH_REASON_UNSPECIFIED)
+
+
+@pytest.fixture(autouse=True)
+def clear_model_cache():
+    chat_client._MODEL_CACHE.clear()
+    yield
+    chat_client._MODEL_CACHE.clear()
+
+
+def client(genai=None, **kwargs):
+    return ChatClient(genai or FakeGenai(), sleep=lambda s: None, **kwargs)
+
+
+def test_pick_model_probes_once_per_key_and_can_forget():
+    genai = FakeGenai(down={"a"})
+    c = client(genai)
+    assert c.pick_model("key", ["a", "b", "c"]) == "b"
+    assert c.pick_model("key", ["a", "b", "c"]) == "b"
+    assert genai.probes == ["a", "b"]
+    c.forget_model("key")
+    genai.down.add("b")
+    assert c.pick_model("key", ["a", "b", "c"]) == "c"
+    assert client(FakeGenai(down={"a", "b", "c"})).pick_model("other", ["a", "b", "c"]) is None
+
+
+def test_configure_points_at_a_local_endpoint():
+    genai = FakeGenai()
+    client(genai, endpoint="localhost:8080").configure("key")
+    assert genai.configured == {'api_key': "key", 'transport': 'rest', 'client_options': {'api_endpoint': "localhost:8080"}}
+
+
+def test_stream_reply_streams_and_answers_tool_calls():
+    seen = []
+
+    def lookup_schedule(semester: int = 0):
+        seen.append(semester)
+        return f"semester {semester}: 3 rows"
+    c = client()
+    c.use_tools([lookup_schedule])
+    model = FakeModel([call("lookup_schedule", semester=2)], [text("שלום "), text("עולם")])
+    chat = ChatSession(model)
+    shown = []
+    assert c.stream_reply(chat, "q", on_text=shown.append) == "שלום עולם"
+    assert shown == ["שלום ", "שלום עולם"] and seen == [2]
+    assert [m.role for m in chat.history] == ['user', 'model', 'user', 'model']
+    assert chat.history[2].parts[0].function_response.response['result'] == "semester 2: 3 rows"
+
+
+def test_failed_request_is_retried_on_a_clean_history():
+    c = client()
+    chat = ChatSession(FakeModel([text("first")], [call("missing")], ConnectionError("down"), [text("ok")]))
+    c.stream_reply(chat, "q1")
+    assert c.stream_reply(chat, "q2") == "ok"
+    assert [m.role for m in chat.history] == ['user', 'model', 'user', 'model']
+    assert chat.model.requests[-1] == ['user', 'model', 'user']
+
+
+def test_broken_stream_is_rewound_before_raising():
+    c = client()
+    chat = ChatSession(FakeModel([text("first")], [text("part"), RuntimeError("cut")], [text("after")]))
+    c.stream_reply(chat, "q1")
+    with pytest.raises(RuntimeError):
+        c.stream_reply(chat, "q2")
+    assert len(chat.history) == 2
+    assert c.stream_reply(chat, "q3") == "after"
+    assert len(chat.history) == 4
+
+
+def test_gives_up_after_the_retries():
+    c = client(retries=2)
+    chat = ChatSession(FakeModel(ConnectionError("1"), ConnectionError("2"), ConnectionError("3")))
+    with pytest.raises(ConnectionError):
+        c.stream_reply(chat, "q")
+    assert chat.history == [] and len(chat.model.requests) == 3
@@ -0,0 +1,19 @@
+"""Metrics collected from scheduler restarts."""
+import pandas as pd
+
+import engine
+from engine import prepare_courses, preprocess_availability, preprocess_courses, run_restarts
+from metrics import Metrics
+
+
+def test_restart_events_are_counted_once(monkeypatch):
+    courses = pd.DataFrame({'מרצה': ["מרצה א"], 'שם קורס': ["קורס א"], 'שעות': [2], 'סמסטר': ["א"]})
+    avail_db, sparsity = preprocess_availability(pd.DataFrame({'שם מלא': ["מרצה א"], '11': ["8-12"]}))
+    courses, _ = prepare_courses(preprocess_courses(courses), avail_db)
+
+    def broken(self, main_row, group, domain): raise RuntimeError("boom")
+    monkeypatch.setattr(engine.Scheduler, 'place', broken)
+    metrics = Metrics()
+    run_restarts(courses, avail_db, sparsity, iterations=0, seed=1, metrics=metrics)
+    assert metrics.counters['scheduler_error'] == 1
+    assert [(e['kind'], e['restart']) for e in metrics.events] == [('scheduler_error', 0)]
@@ -0,0 +1,38 @@
+"""Room allocation: RoomPlan.assign and rooms through the greedy scheduler."""
+import pandas as pd
+
+from engine import CourseRecord, solve
+from rooms import NO_ROOM, RoomInventory
+
+ROOMS = pd.DataFrame({'Room': ["Lab1", "R1"], 'Capacity': [20, 50], 'Type': ["מעבדה", "כיתה"]})
+
+
+def records(*spaces):
+    return [CourseRecord(Row=i, Course=f"קורס {i}", Space=space) for i, space in enumerate(spaces)]
+
+
+def test_linked_group_gets_a_matching_when_greedy_order_fails():
+    group = records(None, "מעבדה", "zoom")
+    plan = RoomInventory(ROOMS).bind(group)
+    rooms = plan.assign(group, {}, 1, 1, 8, 2)
+    assert [plan.names[r] if r != NO_ROOM else None for r in rooms] == ["R1", "Lab1", None]
+
+
+def test_assign_fails_only_without_an_assignment():
+    group = records("מעבדה", "מעבדה")
+    plan = RoomInventory(ROOMS).bind(group)
+    assert plan.assign(group, {}, 1, 1, 8, 2) is None
+    single = records(None)
+    plan = RoomInventory(ROOMS).bind(single)
+    assert plan.assign(single, {}, 1, 1, 8, 2) == [0]                  # tightest room
+    assert plan.assign(single, {(1, 1, 9): 0b01}, 1, 1, 8, 2) == [1]   # Lab1 busy at 9
+
+
+def test_linked_pair_is_scheduled_with_rooms():
+    courses = pd.DataFrame({'מרצה': ["מרצה א", "מרצה ב"], 'שם קורס': ["קורס א", "קורס ב"], 'שעות': [2, 2],
+                            'סמסטר': ["א", "א"], 'קישור': ["L1", "L1"], 'מרחב': [None, "מעבדה"]})
+    avail = pd.DataFrame({'שם מלא': ["מרצה א", "מרצה ב"], '11': ["8-12", "8-12"]})
+    rooms = pd.DataFrame({'חדר': ["Lab1", "R1"], 'קיבולת': [20, 50], 'סוג': ["מעבדה", "כיתה"]})
+    sched, errors, _ = solve(courses, avail, iterations=0, seed=1, rooms_raw=rooms)
+    assert errors.empty
+    assert dict(zip(sched['Course'], sched['Room'])) == {"קורס א": "R1", "קורס ב": "Lab1"}
@@ -0,0 +1,43 @@
+"""CSP solver: incremental runs against a previous schedule."""
+import pandas as pd
+
+from engine import prepare_courses, preprocess_availability, preprocess_courses, run_restarts
+from solver import CSPSolver
+
+
+def instance(courses, avail):
+    avail_db, sparsity = preprocess_availability(pd.DataFrame(avail))
+    courses, _ = prepare_courses(preprocess_courses(pd.DataFrame(courses)), avail_db)
+    return courses, avail_db, sparsity
+
+
+def rerun(courses, avail_db, sparsity, previous):
+    csp = CSPSolver(courses, avail_db, sparsity, time_limit=5)
+    sched, errors = csp.run(previous=previous)
+    return csp, sched, errors
+
+
+def test_back_to_back_sessions_of_a_repeated_row_are_kept():
+    courses, avail_db, sparsity = instance(
+        {'מרצה': ["A", "A", "B", "B"], 'שם קורס': ["X", "X", "Y", "Z"], 'שעות': [2, 2, 3, 1],
+         'סמסטר': ["א"] * 4},
+        {'שם מלא': ["A", "B"], '11': ["8-12", "8-10"], '21': [None, "8-12"]})
+    previous, errors = run_restarts(courses, avail_db, sparsity, iterations=0)
+    assert errors.empty
+    x = previous[previous['Course'] == "X"]
+    assert sorted(x['Hour']) == [8, 9, 10, 11] and x['Day'].nunique() == 1   # one 4h run from two rows
+    for prev in (previous, previous.sort_values(['Semester', 'Day', 'Hour']), previous.sample(frac=1, random_state=1)):
+        csp, sched, errors = rerun(courses, avail_db, sparsity, prev)
+        assert csp.kept == 4 and errors.empty
+        key = ['Course', 'Lecturer', 'Semester', 'Day', 'Hour']
+        assert sched[key].sort_values(key).values.tolist() == previous[key].sort_values(key).values.tolist()
+
+
+def test_changed_placement_is_not_kept():
+    courses, avail_db, sparsity = instance(
+        {'מרצה': ["A"], 'שם קורס': ["X"], 'שעות': [2], 'סמסטר': ["א"]},
+        {'שם מלא': ["A"], '11': ["8-10"], '21': ["8-10"]})
+    previous = pd.DataFrame({'Year': None, 'Semester': 1, 'Day': 3, 'Hour': [8, 9], 'Course': "X", 'Lecturer': "A",
+                             'Space': None, 'LinkID': None})
+    csp, sched, errors = rerun(courses, avail_db, sparsity, previous)
+    assert csp.kept == 0 and errors.empty and set(sched['Day']) == {1}
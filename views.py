@@ -0,0 +1,168 @@
+"""Indexed views of one hourly schedule for the results page.
+
+A ScheduleViews is built once per result (the app keeps it in the result cache next to
+the schedule, so Streamlit reruns reuse it). The positions of the schedule rows per
+lecturer, student year, semester and day are grouped up front, so filtering is an
+intersection of small index arrays instead of a scan over the whole frame. The grids
+(lecturer timetables, student-year weekly grids, free-slot maps, heatmaps) are
+hour × day pivots built on first request and memoized.
+"""
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+INDEX_COLS = ('Lecturer', 'Year', 'Semester', 'Day')
+NO_YEAR = 'No Year'
+_EMPTY = np.array([], dtype=np.int64)
+
+
+def _sheet_name(name, used):
+    """Valid, unique Excel sheet name (max 31 chars, no []:*?/\\)."""
+    base = re.sub(r'[\[\]:*?/\\]', '_', str(name)).strip()[:31] or 'Sheet'
+    out, n = base, 1
+    while out.lower() in used:
+        n += 1
+        out = f"{base[:31 - len(str(n)) - 1]}_{n}"
+    used.add(out.lower())
+    return out
+
+
+class ScheduleViews:
+    """Row indices and memoized grids of an hourly schedule (and its errors)."""
+
+    def __init__(self, schedule, errors=None, avail_masks=None):
+        df = schedule.reset_index(drop=True) if schedule is not None else pd.DataFrame()
+        self.schedule = df
+        self.errors = errors if errors is not None else pd.DataFrame()
+        self.avail_masks = avail_masks
+        self._memo = {}
+        if df.empty:
+            self.index = {col: {} for col in INDEX_COLS}
+            self.hours, self.days = [], []
+            return
+        self.index = {col: df.groupby(col, sort=True).indices for col in INDEX_COLS}
+        self.hours = list(range(int(df['Hour'].min()), int(df['Hour'].max()) + 1))
+        self.days = sorted(int(d) for d in self.index['Day'])
+
+        # תוויות התאים מחושבות פעם אחת לכל השורות
+        course = df['Course'].astype(str)
+        room = df['Room'] if 'Room' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        room = np.where(room.notna(), ' [' + room.astype(str) + ']', '')
+        year = np.where(df['Year'].notna(), ' (' + df['Year'].astype(str) + ')', '')
+        self._lecturer_label = course + year + room
+        self._year_label = course + ' - ' + df['Lecturer'].astype(str) + room
+        # יחידת שיבוץ: קורסים מקושרים באותה שעה הם יחידה אחת ולא התנגשות
+        self._unit = df['LinkID'].where(df['LinkID'].notna(), course + '\x1f' + df['Lecturer'].astype(str))
+
+    @property
+    def lecturers(self): return list(self.index['Lecturer'])
+
+    @property
+    def years(self): return list(self.index['Year'])
+
+    @property
+    def semesters(self): return [int(s) for s in self.index['Semester']]
+
+    def rows(self, lecturer=None, year=None, semester=None, day=None):
+        """Positions of the schedule rows matching every given key (None = any)."""
+        hits = [self.index[col].get(key, _EMPTY)
+                for col, key in zip(INDEX_COLS, (lecturer, year, semester, day)) if key is not None]
+        if not hits: return np.arange(len(self.schedule))
+        hits.sort(key=len)
+        idx = hits[0]
+        for other in hits[1:]: idx = np.intersect1d(idx, other, assume_unique=True)
+        return idx
+
+    def filter(self, lecturer=None, year=None, semester=None, day=None):
+        return self.schedule.iloc[self.rows(lecturer, year, semester, day)]
+
+    def _memoized(self, key, build):
+        if key not in self._memo: self._memo[key] = build()
+        return self._memo[key]
+
+    def _grid(self, rows, labels):
+        """Hour × day grid of the labels of the given rows; parallel entries are joined with ' / '."""
+        df = pd.DataFrame({'Hour': self.schedule['Hour'].to_numpy()[rows], 'Day': self.schedule['Day'].to_numpy()[rows],
+                           'Label': labels.to_numpy()[rows]}).drop_duplicates()
+        grid = df.groupby(['Hour', 'Day'], sort=False)['Label'].agg(' / '.join).unstack('Day') if len(df) else None
+        return (grid if grid is not None else pd.DataFrame()).reindex(index=self.hours, columns=self.days).fillna('')
+
+    def lecturer_timetable(self, lecturer, semester):
+        """Hour × day grid of a lecturer's courses (with student year and room)."""
+        return self._memoized(('lecturer', lecturer, semester), lambda: self._grid(
+            self.rows(lecturer=lecturer, semester=semester), self._lecturer_label))
+
+    def year_grid(self, year, semester):
+        """Hour × day weekly grid of a student year's courses (with lecturer and room)."""
+        return self._memoized(('year', year, semester), lambda: self._grid(
+            self.rows(year=year, semester=semester), self._year_label))
+
+    def free_slots(self, lecturer, semester):
+        """Hour × day map, True where the lecturer is available and not teaching. Needs avail_masks."""
+        if self.avail_masks is None: raise ValueError("free_slots needs the availability masks.")
+
+        def build():
+            rows = self.rows(lecturer=lecturer, semester=semester)
+            busy = {}
+            for day, h in zip(self.schedule['Day'].to_numpy()[rows], self.schedule['Hour'].to_numpy()[rows]):
+                busy[int(day)] = busy.get(int(day), 0) | 1 << int(h)
+            days = sorted({d for (lec, sem, d) in self.avail_masks if lec == lecturer and sem == semester} | set(self.days))
+            free = {d: self.avail_masks.get((lecturer, semester, d), 0) & ~busy.get(d, 0) for d in days}
+            bits = 0
+            for m in free.values(): bits |= m
+            hours = sorted(set(self.hours) | {h for h in range(bits.bit_length()) if bits >> h & 1})
+            return pd.DataFrame([[bool(free[d] >> h & 1) for d in days] for h in hours],
+                                index=pd.Index(hours, name='Hour'), columns=pd.Index(days, name='Day'))
+        return self._memoized(('free', lecturer, semester), build)
+
+    def load_heatmap(self, semester):
+        """Hour × day count of distinct courses taught in parallel."""
+        def build():
+            rows = self.rows(semester=semester)
+            df = pd.DataFrame({'Hour': self.schedule['Hour'].to_numpy()[rows], 'Day': self.schedule['Day'].to_numpy()[rows],
+                               'Unit': self._unit.to_numpy()[rows]})
+            counts = df.groupby(['Hour', 'Day'])['Unit'].nunique().unstack('Day') if len(df) else pd.DataFrame()
+            return counts.reindex(index=self.hours, columns=self.days).fillna(0).astype(int)
+        return self._memoized(('load', semester), build)
+
+    def conflict_heatmap(self, semester, by='Lecturer'):
+        """Hour × day count of lecturers (by='Lecturer') or student years (by='Year') booked twice in one hour.
+
+        Linked courses (same LinkID) in one hour count once, so a valid schedule is all zeros;
+        merged or hand-edited schedules show where they clash.
+        """
+        def build():
+            rows = self.rows(semester=semester)
+            df = pd.DataFrame({'Key': self.schedule[by].to_numpy()[rows], 'Hour': self.schedule['Hour'].to_numpy()[rows],
+                               'Day': self.schedule['Day'].to_numpy()[rows], 'Unit': self._unit.to_numpy()[rows]})
+            units = df.dropna(subset=['Key']).groupby(['Key', 'Day', 'Hour'])['Unit'].nunique()
+            clashes = (units > 1).groupby(level=['Hour', 'Day']).sum()
+            grid = clashes.unstack('Day') if len(clashes) else pd.DataFrame()
+            return grid.reindex(index=self.hours, columns=self.days).fillna(0).astype(int)
+        return self._memoized(('conflict', semester, by), build)
+
+    def year_sheets(self):
+        """{year: (Semester, Hour) × day grid} for every student year, from one groupby over the schedule."""
+        def build():
+            df = self.schedule
+            if df.empty: return {}
+            grid = (pd.DataFrame({'Year': df['Year'].fillna(NO_YEAR), 'Semester': df['Semester'], 'Hour': df['Hour'],
+                                  'Day': df['Day'], 'Label': self._year_label})
+                    .drop_duplicates().groupby(['Year', 'Semester', 'Hour', 'Day'])['Label'].agg(' / '.join)
+                    .unstack('Day').reindex(columns=self.days).fillna(''))
+            return {year: part.droplevel('Year') for year, part in grid.groupby(level='Year', sort=True)}
+        return self._memoized(('sheets',), build)
+
+    def to_excel(self):
+        """Excel workbook bytes: one weekly-grid sheet per student year, plus Errors when there are any."""
+        def build():
+            buf = io.BytesIO()
+            used = set()
+            with pd.ExcelWriter(buf, engine='openpyxl') as writer:
+                for year, grid in self.year_sheets().items(): grid.to_excel(writer, sheet_name=_sheet_name(year, used))
+                if not self.errors.empty: self.errors.to_excel(writer, sheet_name=_sheet_name('Errors', used), index=False)
+                if not used: pd.DataFrame().to_excel(writer, sheet_name='Schedule')
+            return buf.getvalue()
+        return self._memoized(('excel',), build)